@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+
+import sys
+import json
+import warnings
+from os import path
+
+#numpy is imported by the first analysis rather than with this module: it is
+#most of the recorder's startup time and nothing needs it before a phase ends
+np = None
+numpy_import = dict(tried=False)
+
+PERCENTILES = (('median', 50), ('p95', 95), ('p99', 99))
+
+
+def have_numpy():
+    global np
+    if not numpy_import['tried']:
+        numpy_import['tried'] = True
+        try:
+            import numpy as np
+        except ImportError:
+            np = None  #results.py falls back to pure Python
+    return np is not None
+
+
+def channel_matrix(raw):
+    #labels x samples, each column copied into a NaN-filled matrix so ragged
+    #lists from old raw files come out padded
+    labels = list(raw)
+    rows = [np.asarray(raw[k], dtype=np.float64) for k in labels]
+    width = max([len(row) for row in rows] + [0])
+    matrix = np.full((len(rows), width), np.nan)
+    for (i, row) in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return (labels, matrix)
+
+
+def summarize_axis(matrix, axis):
+    if np.isnan(matrix).any():
+        (amax, mean, amin, std, percentile) = (np.nanmax, np.nanmean,
+                np.nanmin, np.nanstd, np.nanpercentile)
+    else:  #the nan* versions are several times slower
+        (amax, mean, amin, std, percentile) = (np.max, np.mean, np.min,
+                np.std, np.percentile)
+    with warnings.catch_warnings():  #all-NaN rows and single samples
+        warnings.simplefilter('ignore', RuntimeWarning)
+        summary = dict(max=amax(matrix, axis=axis),
+                mean=mean(matrix, axis=axis),
+                min=amin(matrix, axis=axis),
+                stdev=std(matrix, axis=axis, ddof=1))
+        qs = percentile(matrix, [q for (key, q) in PERCENTILES], axis=axis)
+        for (i, (key, q)) in enumerate(PERCENTILES):
+            summary[key] = qs[i]
+    for (key, v) in summary.items():
+        summary[key] = np.nan_to_num(v, nan=0.0)  #make sure something happens
+    return summary
+
+
+def summarize_matrix(labels, matrix, j):
+    #per-label and combined max/mean/median/min/stdev/p95/p99 in one pass
+    #over the matrix, keyed the way summarize_temp's output always was
+    summary = {}
+    if matrix.size == 0:
+        matrix = np.full((max(len(labels), 1), 1), np.nan)
+    rows = summarize_axis(matrix, 1)
+    for (i, k) in enumerate(labels):
+        summary[k] = dict((key, float(v[i])) for (key, v) in rows.items())
+    combined = summarize_axis(matrix, None)
+    summary[j] = dict((key, float(v)) for (key, v) in combined.items())
+    return summary
+
+
+def window_start(times, last):
+    #first tick inside the last `last` seconds of the run
+    times = np.asarray(times, dtype=np.float64)
+    if last is None or not len(times):
+        return 0
+    return int(np.searchsorted(times, times[-1] - last, side='left'))
+
+
+def analyze_channel(raw, j, start=0):
+    (labels, matrix) = channel_matrix(raw)
+    return summarize_matrix(labels, matrix[:, start:], j)
+
+
+def analyze_store(store, last=None):
+    start = window_start(store['time'], last)
+    channels = {}
+    for ((channel, k), column) in store['columns'].items():
+        channels.setdefault(channel, {})[k] = column
+    return dict((channel, analyze_channel(raw, channel, start))
+            for (channel, raw) in channels.items())
+
+
+def load_matrix(filename):
+    #the columns.bin layout is already one contiguous row per column, so the
+    #whole file maps onto a single (timestamps + columns) x rows matrix
+    with open(filename, 'rb') as fp:
+        header = json.loads(fp.readline())
+        dtype = np.dtype('<f8' if header['byteorder'] == 'little' else '>f8')
+        data = np.fromfile(fp, dtype=dtype)
+    rows = header['rows']
+    stamps = 2 if header.get('mono') else 1
+    data = data[:rows * (len(header['columns']) + stamps)]
+    matrix = data.reshape(len(header['columns']) + stamps, rows)
+    return (matrix[0], [tuple(key) for key in header['columns']],
+            matrix[stamps:])
+
+
+def analyze_columns_file(filename, last=None):
+    (times, keys, matrix) = load_matrix(filename)
+    start = window_start(times, last)
+    summary = {}
+    channels = sorted(set(channel for (channel, k) in keys))
+    for channel in channels:
+        index = [i for (i, key) in enumerate(keys) if key[0] == channel]
+        labels = [keys[i][1] for i in index]
+        summary[channel] = summarize_matrix(labels,
+                matrix[index, start:], channel)
+    return summary
+
+
+def analyze_raw_file(filename):
+    #temps-<name>-<channel>-raw.json holds a single channel
+    channel = path.basename(filename)[:-len('-raw.json')].rsplit('-', 1)[1]
+    with open(filename) as fp:
+        raw = json.load(fp)
+    return {channel: analyze_channel(raw, channel)}
+
+
+if __name__ == '__main__':
+    #re-analyze old runs, one JSON line per file:
+    #./analysis.py [--last SECONDS] testresults/temps-*-columns.bin
+    #(or -frame.csv, or the per-channel -raw.json of older runs)
+    args = sys.argv[1:]
+    if not have_numpy():
+        sys.exit('analysis.py needs numpy')
+    last = None
+    if args[:1] == ['--last']:
+        last = float(args[1])
+        args = args[2:]
+    for filename in args:
+        if filename.endswith('-columns.bin'):
+            summary = analyze_columns_file(filename, last)
+        elif filename.endswith('-frame.csv'):
+            from columns import load_frame
+            summary = analyze_store(load_frame(filename), last)
+        else:
+            summary = analyze_raw_file(filename)
+        print(json.dumps({filename: summary}, sort_keys=True))
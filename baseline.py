@@ -0,0 +1,72 @@
+import os
+import json
+import time
+from os import path, makedirs
+
+from topology import CACHEDIR
+
+BASELINE_MAX_AGE = 4 * 60 * 60  #seconds an idle baseline stays reusable
+BASELINE_AMBIENT_TOLERANCE = 2.0  #degrees the ambient reading may have moved
+AMBIENT_LABELS = ('Ambient', 'ambient', 'SYSTIN', 'System', 'Board')
+
+
+def ambient_reading(temps):
+    #a board/ambient sensor if the machine has one, else the coolest sensor
+    #before any load, which tracks the room closely enough to key on
+    for label in AMBIENT_LABELS:
+        if label in temps:
+            return temps[label]
+    readings = [v for v in temps.values() if v == v and v > 0]
+    return min(readings) if readings else None
+
+
+def baseline_name(key, cachedir=CACHEDIR):
+    return path.join(cachedir, 'baseline-{}.json'.format(key))
+
+
+def load_baselines(key, cachedir=CACHEDIR):
+    try:
+        with open(baseline_name(key, cachedir)) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return []
+
+
+def find_baseline(key, ambient, cachedir=CACHEDIR, now=None):
+    #newest baseline of this machine that is fresh enough and was taken at a
+    #similar ambient temperature
+    now = time.time() if now is None else now
+    for baseline in reversed(load_baselines(key, cachedir)):
+        if now - baseline['recorded_at'] > BASELINE_MAX_AGE:
+            continue
+        if ambient is None or baseline['ambient'] is None or \
+                abs(ambient - baseline['ambient']) > \
+                BASELINE_AMBIENT_TOLERANCE:
+            continue
+        return baseline
+    return None
+
+
+def save_baseline(key, ambient, name, summary, cachedir=CACHEDIR, now=None):
+    now = time.time() if now is None else now
+    baselines = [b for b in load_baselines(key, cachedir)
+            if now - b['recorded_at'] <= BASELINE_MAX_AGE]
+    baseline = dict(name=name, recorded_at=now, ambient=ambient,
+            summary=summary)
+    baselines.append(baseline)
+    if not path.exists(cachedir):
+        makedirs(cachedir)
+    filename = baseline_name(key, cachedir)
+    with open(filename + '.tmp', 'w') as fp:
+        json.dump(baselines, fp, indent=4, sort_keys=True)
+    os.replace(filename + '.tmp', filename)
+    return baseline
+
+
+def baseline_record(baseline, ambient, reused, now=None):
+    #the 'Baseline' block written into a run's idle summary
+    now = time.time() if now is None else now
+    return {'Baseline': {'reused': reused, 'from': baseline['name'],
+            'recorded_at': baseline['recorded_at'],
+            'age': now - baseline['recorded_at'],
+            'ambient': baseline['ambient'], 'ambient_now': ambient}}
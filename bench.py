@@ -0,0 +1,205 @@
+#!/usr/bin/python3
+
+import sys
+import json
+import time
+import random
+import resource
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from os import path
+from concurrent.futures import ThreadPoolExecutor
+
+from sources import open_collectors
+from scheduler import POOL_SIZE, sample_once
+from topology import ROOT
+from stats import exact_quantile
+from results import TESTDIR, analyze_temps, summarize_temp
+
+BENCH_ITERATIONS = 200
+ALLOC_ITERATIONS = 20  #tracemalloc slows every call, so a separate short pass
+ANALYZE_LABELS = 64  #cores of a big box
+ANALYZE_SAMPLES = 3600  #an hour at one sample a second
+ANALYZE_ITERATIONS = 10  #the pure Python fallback takes ~50 ms a call
+STARTUP_ITERATIONS = 10
+#a one tick record-temps.py run in a fresh interpreter, no ring so a test
+#running meanwhile keeps its own; its Startup block is what gets timed
+STARTUP_PLAN = dict(interval=1, ring=None,
+        phases=[dict(name='startup', prefix='', duration=1)])
+STARTUP_SCRIPT = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from recordtemps import run_plan
+from testplan import load_plan
+run_plan(load_plan(sys.argv[2]), sys.argv[3], quiet=True)
+'''
+#--compare fails a benchmark whose p50 or p99 got slower than this many
+#times the baseline's plus BENCH_SLACK_MS (timer noise on microsecond reads)
+BENCH_BUDGET = 1.25
+BENCH_SLACK_MS = 0.05
+
+
+def bench(fn, iterations):
+    fn()  #warm caches, grow read buffers
+    times = []
+    cpu = time.process_time()
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    cpu = (time.process_time() - cpu) * 1000 / iterations
+    peaks = []
+    tracemalloc.start()
+    for i in range(min(iterations, ALLOC_ITERATIONS)):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    times.sort()
+    return dict(iterations=iterations, p50_ms=exact_quantile(times, 0.5),
+            p99_ms=exact_quantile(times, 0.99), max_ms=times[-1],
+            cpu_ms=cpu, alloc_kb=max(peaks) / 1024.0)
+
+
+def bench_collectors(iterations):
+    #each collector's read + parse on its own, then the whole tick the way
+    #the scheduler takes it
+    results = {}
+    (collectors, close) = open_collectors()
+    try:
+        available = []
+        for (name, fn, slow) in collectors:
+            try:
+                fn()
+            except Exception as e:  #no nvidia-smi, no sensors binary...
+                results['collector:' + name] = dict(unavailable=str(e))
+                continue
+            available.append((name, fn, slow))
+            results['collector:' + name] = bench(fn, iterations)
+        with ThreadPoolExecutor(max_workers=POOL_SIZE) as pool:
+            results['tick'] = bench(lambda: sample_once(available, pool),
+                    iterations)
+    finally:
+        close()
+    return results
+
+
+def bench_analysis(iterations=ANALYZE_ITERATIONS):
+    raw = dict(('Core {}'.format(i), [random.gauss(60, 5)
+            for j in range(ANALYZE_SAMPLES)]) for i in range(ANALYZE_LABELS))
+    return {'analyze_temps': bench(lambda: analyze_temps(raw, 'CPU_Temp'),
+            iterations),
+            'summarize_temp': bench(lambda: summarize_temp(raw.values()),
+            iterations)}
+
+
+def read_startup(filename):
+    #seconds of the Startup block among a summary file's JSON objects
+    with open(filename) as fp:
+        text = fp.read()
+    decoder = json.JSONDecoder()
+    i = 0
+    while i < len(text):
+        (block, i) = decoder.raw_decode(text, i)
+        if 'Startup' in block:
+            return block['Startup']['seconds']
+        while i < len(text) and text[i].isspace():
+            i += 1
+    raise ValueError('no Startup block in {}'.format(filename))
+
+
+def bench_startup(iterations=STARTUP_ITERATIONS):
+    #the same figure as a run's Startup block: interpreter start, imports,
+    #probing and opening the sources up to the first tick's reads; cpu_ms
+    #and rss_kb are the child processes'
+    cmd = [sys.executable, '-c', STARTUP_SCRIPT,
+            path.dirname(path.abspath(__file__))]
+    times = []
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = usage.ru_utime + usage.ru_stime
+    with tempfile.TemporaryDirectory() as scratch:
+        plan = path.join(scratch, 'startup.json')
+        with open(plan, 'w') as fp:
+            json.dump(STARTUP_PLAN, fp)
+        for i in range(iterations + 1):  #the first one warms the page cache
+            name = 'bench-{}'.format(i)
+            subprocess.check_call(cmd + [plan, name], cwd=scratch,
+                    stdout=subprocess.DEVNULL)
+            if i:
+                times.append(read_startup(path.join(scratch, TESTDIR,
+                        'temps-{}-summary.json'.format(name))) * 1000)
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    times.sort()
+    return dict(iterations=iterations, p50_ms=exact_quantile(times, 0.5),
+            p99_ms=exact_quantile(times, 0.99), max_ms=times[-1],
+            cpu_ms=(usage.ru_utime + usage.ru_stime - cpu) * 1000 /
+            (iterations + 1), rss_kb=usage.ru_maxrss)
+
+
+def run_benchmarks(iterations=BENCH_ITERATIONS):
+    results = bench_collectors(iterations)
+    results['startup'] = bench_startup()
+    results.update(bench_analysis())
+    return dict(time=time.time(), root=ROOT, python=platform.python_version(),
+            machine=platform.node(), iterations=iterations,
+            peak_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            results=results)
+
+
+def compare(current, baseline, budget=BENCH_BUDGET, slack=BENCH_SLACK_MS):
+    #[(benchmark, key, baseline, current)] of everything past the budget
+    regressions = []
+    for (name, old) in sorted(baseline['results'].items()):
+        new = current['results'].get(name)
+        if new is None or 'unavailable' in old or 'unavailable' in new:
+            continue
+        for key in ('p50_ms', 'p99_ms'):
+            if new[key] > old[key] * budget + slack:
+                regressions.append((name, key, old[key], new[key]))
+    return regressions
+
+
+def print_results(report):
+    for (name, result) in sorted(report['results'].items()):
+        if 'unavailable' in result:
+            print('{:<24} unavailable: {}'.format(name, result['unavailable']))
+            continue
+        if 'rss_kb' in result:  #a whole process
+            memory = 'rss {:10} kB'.format(result['rss_kb'])
+        else:
+            memory = 'alloc {:8.1f} kB'.format(result['alloc_kb'])
+        print('{:<24} p50 {:8.3f} ms  p99 {:8.3f} ms  cpu {:8.3f} ms  '
+                '{}'.format(name, result['p50_ms'], result['p99_ms'],
+                result['cpu_ms'], memory))
+    print('peak RSS {} kB'.format(report['peak_rss_kb']))
+
+
+if __name__ == '__main__':
+    #./bench.py [--iterations N] [--out bench.json] [--compare baseline.json
+    #[--budget 1.25] [--slack 0.05]]
+    #against fake hardware: THERMAL_ROOT=ROOT PATH=ROOT/bin:$PATH ./bench.py
+    args = sys.argv[1:]
+    options = {}
+    while args[:1] and args[0].startswith('--'):
+        options[args[0]] = args[1]
+        args = args[2:]
+    report = run_benchmarks(int(options.get('--iterations',
+            BENCH_ITERATIONS)))
+    print_results(report)
+    if '--out' in options:
+        with open(options['--out'], 'w') as fp:
+            json.dump(report, fp, indent=4, sort_keys=True)
+    if '--compare' in options:
+        with open(options['--compare']) as fp:
+            baseline = json.load(fp)
+        regressions = compare(report, baseline,
+                float(options.get('--budget', BENCH_BUDGET)),
+                float(options.get('--slack', BENCH_SLACK_MS)))
+        for (name, key, old, new) in regressions:
+            print('REGRESSION {} {}: {:.3f} -> {:.3f} ms'.format(name, key,
+                    old, new))
+        if regressions:
+            sys.exit(1)
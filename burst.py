@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from os import path, makedirs
+
+from results import TESTDIR
+
+#plan "burst" object overrides these; a plan without one never bursts
+BURST_RATE = 20  #Hz the fast readers are sampled at
+BURST_PRE = 5  #seconds kept from before the trigger
+BURST_POST = 5  #seconds captured after it
+BURST_TEMP_JUMP = 5  #degrees up within one second
+BURST_CLOCK_DROP = 0.3  #fraction of a core's clock lost within one second
+BURST_FAN_COLLAPSE = 0.5  #fraction of a fan's RPM lost within one second
+MAX_BURSTS = 20
+BURST_COLLECTORS = ('temps', 'cpuclock', 'fans')
+
+
+def new_burst(name, rate=BURST_RATE, pre=BURST_PRE, post=BURST_POST,
+        temp_jump=BURST_TEMP_JUMP, clock_drop=BURST_CLOCK_DROP,
+        fan_collapse=BURST_FAN_COLLAPSE, max_bursts=MAX_BURSTS):
+    #only the pre-trigger window (and at least the one second the triggers
+    #look back over) is ever held in memory
+    return dict(name=name, rate=rate, pre=pre, post=post, temp_jump=temp_jump,
+            clock_drop=clock_drop, fan_collapse=fan_collapse,
+            max_bursts=max_bursts, loaded=False,
+            ring=deque(maxlen=int(max(pre, 1) * rate) + 1),
+            captures=[], stop=threading.Event(), thread=None)
+
+
+def set_burst_load(burst, loaded):
+    #whether the current phase runs stress; an idle CPU drops its clocks and
+    #a quiet fan curve spins down all the time, so only a temperature jump
+    #triggers a capture without load
+    burst['loaded'] = loaded
+
+
+def check_triggers(burst, sample):
+    #compare against the sample one second back in the ring
+    ring = burst['ring']
+    back = int(burst['rate'])
+    if len(ring) <= back:
+        return None
+    (t, before) = ring[-back - 1]
+    for (k, v) in sample.get('CPU_Temp', {}).items():
+        old = before.get('CPU_Temp', {}).get(k)
+        if old is not None and v - old >= burst['temp_jump']:
+            return 'CPU_Temp {} jumped {:.0f} -> {:.0f}'.format(k, old, v)
+    if not burst['loaded']:
+        return None
+    for (channel, fraction) in (('CPU_Clockspeed', burst['clock_drop']),
+            ('Fan_Speed', burst['fan_collapse'])):
+        for (k, v) in sample.get(channel, {}).items():
+            old = before.get(channel, {}).get(k)
+            if old and v < old * (1 - fraction):
+                return '{} {} dropped {:.0f} -> {:.0f}'.format(channel, k,
+                        old, v)
+    return None
+
+
+def burst_filename(burst, n):
+    return TESTDIR + 'temps-{}-burst-{}.jsonl'.format(burst['name'], n)
+
+
+def write_capture(burst, trigger, t, samples):
+    if not path.exists(TESTDIR):
+        makedirs(TESTDIR)
+    filename = burst_filename(burst, len(burst['captures']))
+    with open(filename, 'x') as fp:
+        fp.write(json.dumps(dict(trigger=trigger, time=t,
+                rate=burst['rate'])) + '\n')
+        for (ts, sample) in samples:
+            fp.write(json.dumps(dict(time=ts, sample=sample)) + '\n')
+        fp.flush()
+        os.fsync(fp.fileno())
+    burst['captures'].append(dict(file=filename, trigger=trigger, time=t))
+
+
+def burst_loop(burst, collectors):
+    interval = 1.0 / burst['rate']
+    start = time.monotonic()
+    i = 0
+    post = None  #(trigger, time, samples) while filling the post window
+    while not burst['stop'].is_set():
+        i += 1
+        delay = start + i * interval - time.monotonic()
+        if delay > 0:
+            burst['stop'].wait(delay)
+        else:  #fell behind, skip ahead instead of bursting to catch up
+            i = int((time.monotonic() - start) / interval)
+        t = time.time()
+        sample = {}
+        for (name, fn, slow) in collectors:
+            sample.update(fn())
+        if post is not None:
+            post[2].append((t, sample))
+            if t - post[1] >= burst['post']:
+                write_capture(burst, post[0], post[1], post[2])
+                post = None
+                burst['ring'].clear()  #no retrigger on the same event
+        elif len(burst['captures']) < burst['max_bursts']:
+            trigger = check_triggers(burst, sample)
+            if trigger is not None:
+                kept = int(burst['pre'] * burst['rate'])
+                pre = list(burst['ring'])[-kept:] if kept else []
+                post = (trigger, t, pre + [(t, sample)])
+        burst['ring'].append((t, sample))
+    if post is not None:  #stopped mid-capture, keep what there is
+        write_capture(burst, post[0], post[1], post[2])
+
+
+def start_burst(burst, collectors):
+    #its own thread and its own open readers, next to the 1 Hz schedule
+    fast = [c for c in collectors if c[0] in BURST_COLLECTORS and not c[2]]
+    burst['thread'] = threading.Thread(target=burst_loop,
+            args=(burst, fast), name='burst', daemon=True)
+    burst['thread'].start()
+
+
+def stop_burst(burst):
+    burst['stop'].set()
+    burst['thread'].join()
+    return {'Bursts': {'captured': len(burst['captures']),
+            'captures': burst['captures']}}
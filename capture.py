@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+
+import sys
+import gzip
+import json
+import struct
+import zlib
+from os import path, makedirs
+
+from results import TESTDIR, analyze_temps
+from columns import new_store, append_sample, export_raw, store_columns
+from sources import source_parser
+
+CAPTURE_LEVEL = 1  #gzip level: the raw procfs text shrinks ~10x even at 1
+
+#a gzip stream of records, each a (type, length) header and its payload:
+#HEADER once, JSON {"sources": [{name, kind, meta}, ...]}; then per tick a
+#TICK (tick, wall time, monotonic time, phase) followed by a DATA record
+#(source index, raw bytes) for every source read on that tick
+RECORD = struct.Struct('<BI')
+TICK = struct.Struct('<Qdd')
+DATA = struct.Struct('<H')
+(HEADER_RECORD, TICK_RECORD, DATA_RECORD) = range(3)
+
+
+def capture_name(name):
+    return TESTDIR + 'temps-{}-capture.bin.gz'.format(name)
+
+
+def open_capture(name):
+    if not path.exists(TESTDIR):
+        makedirs(TESTDIR)
+    fp = gzip.open(capture_name(name), 'xb', compresslevel=CAPTURE_LEVEL)
+    return dict(fp=fp, sources=[], pending=[], started=False)
+
+
+def capture_tap(capture):
+    #for sources.open_collectors: remembers each source and wraps its read
+    #so the raw bytes are kept for the tick they were read on
+    def tap(source):
+        index = len(capture['sources'])
+        capture['sources'].append(dict(name=source['name'],
+                kind=source['kind'], meta=source['meta']))
+        read = source['read']
+
+        def captured():
+            data = read()
+            capture['pending'].append((index, data))  #pool threads too
+            return data
+        return captured
+    return tap
+
+
+def write_record(fp, kind, payload):
+    fp.write(RECORD.pack(kind, len(payload)))
+    fp.write(payload)
+
+
+def write_capture_tick(capture, i, t, mono, phase=''):
+    fp = capture['fp']
+    if not capture['started']:
+        write_record(fp, HEADER_RECORD,
+                json.dumps(dict(sources=capture['sources'])).encode())
+        capture['started'] = True
+    write_record(fp, TICK_RECORD, TICK.pack(i, t, mono) + phase.encode())
+    (pending, capture['pending']) = (capture['pending'], [])
+    for (index, data) in pending:
+        write_record(fp, DATA_RECORD, DATA.pack(index) + data)
+
+
+def close_capture(capture):
+    capture['fp'].close()
+
+
+def iter_records(fp):
+    while True:
+        head = fp.read(RECORD.size)
+        if len(head) < RECORD.size:
+            return
+        (kind, length) = RECORD.unpack(head)
+        payload = fp.read(length)
+        if len(payload) < length:  #torn last record
+            return
+        yield (kind, payload)
+
+
+def iter_capture(filename):
+    #(header, ticks): yields (tick, time, mono, phase, [(source, bytes)])
+    with gzip.open(filename, 'rb') as fp:
+        header = None
+        tick = None
+        try:
+            for (kind, payload) in iter_records(fp):
+                if kind == HEADER_RECORD:
+                    header = json.loads(payload)
+                elif kind == TICK_RECORD:
+                    if tick is not None:
+                        yield (header, tick)
+                    (i, t, mono) = TICK.unpack_from(payload)
+                    tick = (i, t, mono, payload[TICK.size:].decode(), [])
+                elif kind == DATA_RECORD:
+                    source = DATA.unpack_from(payload)[0]
+                    tick[4].append((source, payload[DATA.size:]))
+        except (EOFError, zlib.error):  #run killed mid-write
+            pass
+        if tick is not None:
+            yield (header, tick)
+
+
+def replay_capture(filename):
+    #{phase prefix: columns store}, parsed with fresh parsers exactly as the
+    #live run parsed them
+    stores = {}
+    parsers = None
+    for (header, (i, t, mono, phase, reads)) in iter_capture(filename):
+        if parsers is None:
+            parsers = [source_parser(s['kind'], s['meta'])
+                    for s in header['sources']]
+        sample = {}
+        for (source, data) in reads:
+            sample.update(parsers[source](data))
+        store = stores.get(phase)
+        if store is None:
+            store = stores[phase] = new_store()
+        append_sample(store, t, sample, mono)
+    return stores
+
+
+def analyze_capture(filename):
+    summary = {}
+    for (phase, store) in replay_capture(filename).items():
+        raw = export_raw(store)
+        summary[phase] = dict((channel, analyze_temps(raw[channel], channel))
+                for channel in raw)
+    return summary
+
+
+if __name__ == '__main__':
+    #re-parse and re-analyze captured runs, one JSON line per file:
+    #./capture.py testresults/temps-*-capture.bin.gz
+    #or write the results files afresh under a new name:
+    #./capture.py --store NAME testresults/temps-<name>-capture.bin.gz
+    args = sys.argv[1:]
+    if args[:1] == ['--store']:
+        for (phase, store) in replay_capture(args[2]).items():
+            store_columns(phase + args[1], store)
+    else:
+        for filename in args:
+            print(json.dumps({filename: analyze_capture(filename)},
+                    sort_keys=True))
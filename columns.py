@@ -0,0 +1,128 @@
+import sys
+import csv
+import json
+from array import array
+from os import path, makedirs
+
+from results import TESTDIR, store_run
+
+MISSING = float('nan')
+
+
+def new_store():
+    #one array('d') per (channel, label) plus shared wall clock and monotonic
+    #tick timestamp columns: 8 bytes a sample instead of a boxed float in a
+    #list
+    return dict(time=array('d'), mono=array('d'), columns={})
+
+
+def append_sample(store, t, sample, mono=MISSING):
+    rows = len(store['time'])
+    columns = store['columns']
+    for (channel, values) in sample.items():
+        for (k, v) in values.items():
+            column = columns.get((channel, k))
+            if column is None:  #label appeared mid-run, pad what it missed
+                column = columns[(channel, k)] = array('d', [MISSING]) * rows
+            column.append(v)
+    store['time'].append(t)
+    store['mono'].append(mono)
+    rows += 1
+    for column in columns.values():
+        if len(column) < rows:
+            column.append(MISSING)
+
+
+def export_raw(store):
+    #the {channel: {label: samples}} layout analyze_temps takes, sharing the
+    #column arrays rather than copying them
+    raw = {}
+    for ((channel, k), column) in store['columns'].items():
+        raw.setdefault(channel, {})[k] = column
+    return raw
+
+
+def columns_name(name):
+    return TESTDIR + 'temps-{}-columns.bin'.format(name)
+
+
+def frame_name(name):
+    return TESTDIR + 'temps-{}-frame.csv'.format(name)
+
+
+def dump_frame(name, store):
+    #the raw samples as one aligned table: a row per tick, a column per
+    #channel/label, empty where a label had no reading on that tick
+    if not path.exists(TESTDIR):
+        makedirs(TESTDIR)
+    keys = sorted(store['columns'])
+    columns = [store['time'], store['mono']] + \
+            [store['columns'][key] for key in keys]
+    with open(frame_name(name), 'x', newline='') as fp:
+        out = csv.writer(fp)
+        out.writerow(['time', 'mono'] + ['/'.join(key) for key in keys])
+        for row in zip(*columns):
+            out.writerow(['' if v != v else repr(v) for v in row])
+
+
+def load_frame(filename):
+    store = new_store()
+    with open(filename, newline='') as fp:
+        rows = csv.reader(fp)
+        keys = [tuple(k.split('/', 1)) for k in next(rows)[2:]]
+        for key in keys:
+            store['columns'][key] = array('d')
+        for row in rows:
+            values = [float(v) if v else MISSING for v in row]
+            store['time'].append(values[0])
+            store['mono'].append(values[1])
+            for (key, v) in zip(keys, values[2:]):
+                store['columns'][key].append(v)
+    return store
+
+
+def dump_columns(name, store):
+    #a one line JSON header followed by the raw native-endian doubles of the
+    #time and mono columns and then every channel column, each rows * 8 bytes
+    #long
+    if not path.exists(TESTDIR):
+        makedirs(TESTDIR)
+    keys = sorted(store['columns'])
+    header = dict(rows=len(store['time']), byteorder=sys.byteorder,
+            mono=True, columns=[list(key) for key in keys])
+    with open(columns_name(name), 'xb') as fp:
+        fp.write(json.dumps(header).encode() + b'\n')
+        store['time'].tofile(fp)
+        store['mono'].tofile(fp)
+        for key in keys:
+            store['columns'][key].tofile(fp)
+
+
+def load_columns(filename):
+    store = new_store()
+    with open(filename, 'rb') as fp:
+        header = json.loads(fp.readline())
+        rows = header['rows']
+        swap = header['byteorder'] != sys.byteorder
+        store['time'].fromfile(fp, rows)
+        if header.get('mono'):
+            store['mono'].fromfile(fp, rows)
+        else:  #written before ticks carried a monotonic stamp
+            store['mono'] = array('d', [MISSING]) * rows
+        for (channel, k) in header['columns']:
+            column = array('d')
+            column.fromfile(fp, rows)
+            store['columns'][(channel, k)] = column
+    if swap:
+        store['time'].byteswap()
+        store['mono'].byteswap()
+        for column in store['columns'].values():
+            column.byteswap()
+    return store
+
+
+def store_columns(name, store):
+    summary = store_run(name, export_raw(store))
+    dump_frame(name, store)
+    dump_columns(name, store)
+    return summary
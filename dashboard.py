@@ -0,0 +1,73 @@
+import sys
+import time
+import shutil
+
+DASHBOARD_FPS = 2  #frames a second at most, however fast the ticks come
+MAX_EVENTS = 5  #most recent messages kept under the table
+
+
+def new_dashboard(fps=DASHBOARD_FPS, out=None):
+    return dict(fps=fps, out=out or sys.stdout, channels={}, last=None,
+            lines=[], events=[], frame=None)
+
+
+def update_dashboard(dash, sample):
+    #cheap per tick bookkeeping: the hottest label now and the run's extremes
+    for (channel, values) in sample.items():
+        values = [v for v in values.values() if v == v]
+        if not values:
+            continue
+        (low, high) = (min(values), max(values))
+        entry = dash['channels'].get(channel)
+        if entry is None:
+            entry = dash['channels'][channel] = dict(min=low, max=high)
+        entry.update(current=high, labels=len(values),
+                min=min(entry['min'], low), max=max(entry['max'], high))
+
+
+def note_dashboard(dash, message):
+    dash['events'] = (dash['events'] + [message])[-MAX_EVENTS:]
+
+
+def dashboard_lines(dash, phase, remaining, total, alerts):
+    lines = ['{}  {:.0f}s left in phase, {:.0f}s in plan  {}'.format(phase,
+            remaining, total, time.strftime('%H:%M:%S')),
+            '{:<24} {:>10} {:>10} {:>10} {:>6}'.format('channel', 'now',
+            'min', 'max', 'labels')]
+    for (channel, entry) in sorted(dash['channels'].items()):
+        lines.append('{:<24} {:>10.1f} {:>10.1f} {:>10.1f} {:>6}'.format(
+                channel, entry['current'], entry['min'], entry['max'],
+                entry['labels']))
+    lines.append('')
+    for alert in alerts:
+        lines.append('\x1b[1;31m!! {}\x1b[0m'.format(alert))
+    for event in dash['events']:
+        lines.append('   ' + event)
+    return lines
+
+
+def render_dashboard(dash, phase, remaining, total, alerts=(), force=False):
+    #at most `fps` frames a second, and only the lines that changed are
+    #rewritten in place
+    now = time.monotonic()
+    if not force and dash['frame'] is not None and \
+            now - dash['frame'] < 1.0 / dash['fps']:
+        return False
+    width = shutil.get_terminal_size().columns
+    lines = [line[:width] if '\x1b' not in line else line
+            for line in dashboard_lines(dash, phase, remaining, total, alerts)]
+    out = []
+    if dash['frame'] is None:  #the one full clear
+        out.append('\x1b[H\x1b[2J')
+    for (row, line) in enumerate(lines):
+        if row < len(dash['lines']) and dash['lines'][row] == line:
+            continue
+        out.append('\x1b[{};1H{}\x1b[K'.format(row + 1, line))
+    if len(lines) < len(dash['lines']):
+        out.append('\x1b[{};1H\x1b[J'.format(len(lines) + 1))
+    out.append('\x1b[{};1H'.format(len(lines) + 1))
+    dash['out'].write(''.join(out))
+    dash['out'].flush()
+    dash['lines'] = lines
+    dash['frame'] = now
+    return True
@@ -0,0 +1,98 @@
+import os
+import time
+
+from procfs import open_proc, pread_proc, close_proc
+from sources import spawned
+from stats import summarize_stats
+
+#percent of one CPU the recorder itself may use before a run's summary says
+#the measurement may have disturbed what it measured; the plan's "harness"
+#object overrides it
+HARNESS_CPU_BUDGET = 2.0
+#seconds from the interpreter starting to the first sample's reads
+STARTUP_BUDGET = 1.0
+#the recorder's own channels, next to the thermal ones
+HARNESS_CHANNELS = ('Tick_Lateness', 'Missed_Deadlines', 'Spawns',
+        'Read_Errors', 'Harness_CPU', 'Harness_RSS')
+
+
+def process_started():
+    #time.monotonic() of when this process was started, from its start time
+    #in clock ticks since boot; field 22 of stat, counted after the ')' that
+    #ends the command name
+    with open('/proc/self/stat') as fp:
+        fields = fp.read().rsplit(')', 1)[1].split()
+    age = time.clock_gettime(time.CLOCK_BOOTTIME) - \
+            int(fields[19]) / float(os.sysconf('SC_CLK_TCK'))
+    return time.monotonic() - age
+
+
+def new_harness(started=None, cpu_budget=HARNESS_CPU_BUDGET,
+        startup_budget=STARTUP_BUDGET):
+    #always the recorder's own /proc, even when THERMAL_ROOT points elsewhere
+    return dict(cpu_budget=cpu_budget, statm=open_proc('/proc/self/statm'),
+            page=os.sysconf('SC_PAGE_SIZE'), last=None, missed=0, spawns=0,
+            started=process_started() if started is None else started,
+            startup=None, startup_budget=startup_budget)
+
+
+def harness_tick(harness, stamp):
+    #{channel: {label: value}} of what this tick cost the recorder
+    cpu = time.process_time()  #every thread: scheduler, pool, burst
+    rss = int(pread_proc(harness['statm']).split()[1]) * harness['page']
+    channels = dict(Tick_Lateness=dict(ms=stamp['late'] * 1000),
+            Missed_Deadlines=dict(count=stamp['missed'] - harness['missed']),
+            Spawns=dict(count=spawned['count'] - harness['spawns']),
+            Read_Errors=dict(count=len(stamp['errors'])),
+            Harness_RSS=dict(MB=rss / float(1 << 20)))
+    if harness['startup'] is None:
+        harness['startup'] = stamp['mono'] - harness['started']
+    if harness['last'] is not None:
+        (mono, last_cpu) = harness['last']
+        if stamp['mono'] > mono:
+            channels['Harness_CPU'] = dict(percent=(cpu - last_cpu) /
+                    (stamp['mono'] - mono) * 100)
+    harness['last'] = (stamp['mono'], cpu)
+    harness['missed'] = stamp['missed']
+    harness['spawns'] = spawned['count']
+    return channels
+
+
+def summarize_harness(harness, store, stats):
+    #the 'Harness' block of a phase's summary, from its store and stats
+    collectors = {}
+    for ((channel, k), column) in store['columns'].items():
+        if channel != 'Read_Latency':
+            continue
+        values = [v for v in column if v == v]
+        collectors[k] = dict(
+                mean_ms=sum(values) / len(values) if values else 0.0,
+                max_ms=max(values) if values else 0.0)
+    summaries = dict((channel, summarize_stats(stats[channel]))
+            for channel in HARNESS_CHANNELS if channel in stats)
+    totals = dict((channel, int(round(stats[channel]['mean'] *
+            stats[channel]['n']))) for channel in ('Missed_Deadlines',
+            'Spawns', 'Read_Errors') if channel in stats)
+    cpu = summaries.get('Harness_CPU', dict(mean=0.0, max=0.0))
+    lateness = summaries.get('Tick_Lateness', dict(p99=0.0, max=0.0))
+    return {'Harness': {'collectors': collectors,
+            'cpu_percent_mean': cpu['mean'], 'cpu_percent_max': cpu['max'],
+            'cpu_budget': harness['cpu_budget'],
+            'within_budget': cpu['mean'] <= harness['cpu_budget'],
+            'rss_mb_max': summaries.get('Harness_RSS', dict(max=0.0))['max'],
+            'lateness_ms_p99': lateness['p99'],
+            'lateness_ms_max': lateness['max'],
+            'missed_deadlines': totals.get('Missed_Deadlines', 0),
+            'spawns': totals.get('Spawns', 0),
+            'read_errors': totals.get('Read_Errors', 0)}}
+
+
+def summarize_startup(harness):
+    #the 'Startup' block of the first phase's summary
+    return {'Startup': {'seconds': harness['startup'],
+            'budget': harness['startup_budget'],
+            'within_budget': harness['startup'] <= harness['startup_budget']}}
+
+
+def close_harness(harness):
+    close_proc(harness['statm'])
@@ -0,0 +1,86 @@
+import os
+import re
+from glob import glob
+
+HWMON_ROOT = '/sys/class/hwmon'
+SKIP_LABELS = ('temp1', 'temp2', 'Package id 0')
+
+
+def natural_key(name):
+    return [int(s) if s.isdigit() else s for s in re.split(r'(\d+)', name)]
+
+
+def iter_hwmon_inputs(root=HWMON_ROOT, kind='temp'):
+    chips = sorted(glob(os.path.join(root, 'hwmon*')), key=natural_key)
+    for chip in chips:
+        inputs = sorted(glob(os.path.join(chip, kind + '*_input')),
+                key=natural_key)
+        for inp in inputs:
+            base = inp[:-len('_input')]
+            try:
+                with open(base + '_label') as fp:
+                    label = fp.read().strip()
+            except OSError:  #sensors falls back to the bare name too
+                label = os.path.basename(base)
+            yield (label, inp)
+
+
+def open_hwmon(root=HWMON_ROOT, inputs=None, kind='temp'):
+    #discover once (or take a cached discovery), keep the fds open and pread
+    #them every tick
+    if inputs is None:
+        inputs = iter_hwmon_inputs(root, kind)
+    sensors = []
+    for (label, inp) in inputs:
+        if label in SKIP_LABELS:
+            continue
+        try:
+            fd = os.open(inp, os.O_RDONLY)
+        except OSError:
+            continue
+        sensors.append((label, fd))
+    return sensors
+
+
+def pread_hwmon(sensors):
+    #the raw readings of one tick, a line per input in `sensors` order and an
+    #empty one for an input that failed
+    lines = []
+    for (label, fd) in sensors:
+        try:
+            lines.append(os.pread(fd, 32, 0).strip())
+        except OSError:
+            lines.append(b'')
+    return b'\n'.join(lines)
+
+
+def iter_hwmon_values(labels, data):
+    for (label, line) in zip(labels, data.split(b'\n')):
+        try:
+            yield (label, int(line))
+        except ValueError:
+            yield (label, 0)
+
+
+def parse_hwmon(labels, data):
+    temps = {}
+    for (label, millideg) in iter_hwmon_values(labels, data):
+        #sensors prints '+45.9°C' and parse_temps keeps the whole degrees
+        if millideg < 0:
+            millideg = 0
+        temps[label] = float(int(round(millideg / 1000.0, 1)))
+    return temps
+
+
+def parse_hwmon_fans(labels, data):
+    return dict((label, float(rpm))
+            for (label, rpm) in iter_hwmon_values(labels, data))
+
+
+def hwmon_labels(sensors):
+    return [label for (label, fd) in sensors]
+
+
+def close_hwmon(sensors):
+    for (label, fd) in sensors:
+        os.close(fd)
@@ -0,0 +1,148 @@
+import os
+import re
+import operator
+from glob import glob
+
+from columns import MISSING
+
+PROC_ROOT = '/proc'
+CPU_ROOT = '/sys/devices/system/cpu'
+
+
+def open_proc(filename, size=4096):
+    return dict(fd=os.open(filename, os.O_RDONLY), buf=bytearray(size))
+
+
+def close_proc(f):
+    os.close(f['fd'])
+
+
+def pread_proc(f):
+    #procfs regenerates the file on every read from offset 0, so one pread
+    #into the same buffer is a fresh snapshot; grow it until everything fits
+    while True:
+        n = os.preadv(f['fd'], [f['buf']], 0)
+        if n < len(f['buf']):
+            return bytes(memoryview(f['buf'])[:n])
+        f['buf'].extend(bytes(len(f['buf'])))
+
+
+def iter_cpuinfo_clock(data):
+    cpu = None
+    for line in data.splitlines():
+        if line.startswith(b'processor'):
+            cpu = int(line.split(b':')[1])
+        elif line.startswith(b'cpu MHz') and cpu is not None:
+            yield ('Core ' + str(cpu), float(line.split(b':')[1]))
+
+
+def parse_cpuinfo_clock(data):
+    return dict(iter_cpuinfo_clock(data))
+
+
+def open_cpufreq(root=CPU_ROOT):
+    files = []
+    for name in glob(os.path.join(root, 'cpu[0-9]*', 'cpufreq',
+            'scaling_cur_freq')):
+        cpu = int(re.search(r'cpu(\d+)', name[len(root):]).group(1))
+        files.append((cpu, open_proc(name, 64)))
+    return sorted(files, key=lambda item: item[0])
+
+
+def pread_cpufreq(files):
+    #a line per cpu in `files` order, empty for one that went offline
+    lines = []
+    for (cpu, f) in files:
+        try:
+            lines.append(pread_proc(f).strip())
+        except OSError:
+            lines.append(b'')
+    return b'\n'.join(lines)
+
+
+def parse_cpufreq(cpus, data):
+    clock = {}
+    for (cpu, line) in zip(cpus, data.split(b'\n')):
+        try:
+            khz = int(line)
+        except ValueError:
+            khz = 0
+        clock['Core ' + str(cpu)] = khz / 1000.0
+    return clock
+
+
+def close_cpufreq(files):
+    for (cpu, f) in files:
+        close_proc(f)
+
+
+def parse_meminfo(data):
+    fields = {}
+    for line in data.splitlines():
+        (label, tail) = line.split(b':', 1)
+        fields[label] = int(tail.split()[0])
+    total = fields[b'MemTotal']
+    if b'MemAvailable' in fields:
+        available = fields[b'MemAvailable']
+    else:  #kernels before 3.14
+        available = fields[b'MemFree'] + fields.get(b'Buffers', 0) \
+                + fields.get(b'Cached', 0)
+    #same figure as free's used/total
+    return {'Mem': (float(total - available) / total) * 100}
+
+
+CPUSTAT_CHANNELS = (('CPU_User', (0, 1)), ('CPU_System', (2, 5, 6)),
+        ('CPU_IOWait', (4,)), ('CPU_Steal', (7,)))
+#a core whose counters moved fewer jiffies (USER_HZ, 100 a second) than this
+#since the last read is mostly rounding, e.g. the first tick a few ms after
+#the counters were primed; it reads MISSING and its next delta runs from
+#the same counters
+CPUSTAT_MIN_JIFFIES = 5
+
+
+def parse_cpustat(data):
+    #cpuN user nice system idle iowait irq softirq steal guest guest_nice;
+    #guest time is already counted in user, so only the first eight add up
+    counters = {}
+    for line in data.splitlines():
+        if line.startswith(b'cpu') and line[3:4].isdigit():
+            fields = line.split()
+            counters[int(fields[0][3:])] = list(map(int, fields[1:9]))
+    return counters
+
+
+def open_cpustat(proc=PROC_ROOT):
+    f = open_proc(os.path.join(proc, 'stat'), 1 << 16)
+    prime = pread_proc(f)
+    return dict(f=f, prime=prime, prev=parse_cpustat(prime))
+
+
+def cpustat_usage(cpustat, data):
+    #busy% per core from the counter deltas since the previous tick, so
+    #nothing has to sleep the way psutil.cpu_percent(interval=...) does
+    counters = parse_cpustat(data)
+    busy = {}
+    usage = {'CPU_Utilization': busy}
+    channels = [(usage.setdefault(c, {}), fields)
+            for (c, fields) in CPUSTAT_CHANNELS]
+    for (cpu, now) in sorted(counters.items()):
+        prev = cpustat['prev'].get(cpu, now)
+        delta = list(map(operator.sub, now, prev))
+        total = sum(delta)
+        label = 'Core: ' + str(cpu)
+        if total < CPUSTAT_MIN_JIFFIES:  #or the cpu just came online
+            busy[label] = MISSING
+            for (values, fields) in channels:
+                values[label] = MISSING
+            counters[cpu] = prev
+            continue
+        scale = 100.0 / total
+        busy[label] = (total - delta[3] - delta[4]) * scale
+        for (values, fields) in channels:
+            values[label] = sum([delta[i] for i in fields]) * scale
+    cpustat['prev'] = counters
+    return usage
+
+
+def close_cpustat(cpustat):
+    close_proc(cpustat['f'])
@@ -0,0 +1,310 @@
+import sys
+import time
+from sources import open_collectors, probe_sources
+from scheduler import run_schedule
+from topology import load_topology
+from results import TESTDIR, dump_summary
+from samplelog import open_samplelog, write_sample, close_samplelog
+from columns import new_store, append_sample, store_columns
+from stats import update_channel_stats
+from steadystate import update_steady
+from baseline import ambient_reading, find_baseline, save_baseline, \
+        baseline_record
+from throttle import new_throttle, update_throttle, summarize_throttle
+from safety import new_safety, check_safety
+from burst import BURST_COLLECTORS, new_burst, set_burst_load, \
+        start_burst, stop_burst
+from capture import open_capture, capture_tap, write_capture_tick, \
+        close_capture
+from shmring import create_ring, set_ring_phase, publish_ring, close_ring, \
+        summarize_ring
+from dashboard import new_dashboard, update_dashboard, note_dashboard, \
+        render_dashboard
+from harness import HARNESS_CHANNELS, process_started, new_harness, \
+        harness_tick, summarize_harness, summarize_startup, close_harness
+from testplan import DEFAULT_PLAN, load_plan, phase_ticks, phase_detector, \
+        switch_stress, stop_stress, unsupported_stress
+
+
+def show_tick(dash, plan, results, phases, alerts, force=False):
+    current = results[-1]
+    left = current['ticks'] - current['elapsed']
+    later = sum(phase_ticks(plan, phase) for phase in phases[len(results):])
+    render_dashboard(dash, current['phase']['name'], left * plan['interval'],
+            (left + later) * plan['interval'], alerts, force)
+
+
+def store_phase(result, custname, harness):
+    #one set of temps-<prefix><name>-* files per phase, as the separate
+    #run() calls used to write
+    name = result['phase']['prefix'] + custname
+    store = result['store']
+    steady = result['steady']
+    summary = store_columns(name, store)
+    ended = result['ended']
+    if len(store['time']):
+        ended['after'] = store['time'][-1] - result['start']
+    sampled = len(store['time'])
+    sampling = {'Sampling': {'ticks': result['ticks'],
+            'missed_deadlines': result['elapsed'] - sampled,
+            'sampled': sampled, 'ended_by': ended['by'],
+            'ended_after': ended['after'], 'ended_reason': ended['reason'],
+            'peak_rise': steady['peak_rise'] if steady else None,
+            'peak_fall': steady['peak_fall'] if steady else None,
+            'read_errors': result['read_errors']}}
+    dump_summary(name, sampling)
+    throttling = summarize_throttle(result['throttle'])
+    dump_summary(name, throttling)
+    print('{}: throttled {} times for {:.0f}s'.format(result['phase']['name'],
+            throttling['Throttling']['throttle_count'],
+            throttling['Throttling']['throttled_seconds']))
+    print('{}: missed {} of {} sample deadlines'.format(
+            result['phase']['name'], result['elapsed'] - sampled,
+            result['elapsed']))
+    for (collector, errors) in sorted(result['read_errors'].items()):
+        print('{}: {} read failed on {} ticks'.format(result['phase']['name'],
+                collector, errors))
+    overhead = summarize_harness(harness, store, result['stats'])
+    dump_summary(name, overhead)
+    print('{}: recorder used {:.1f}% CPU (budget {:.1f}%){}'.format(
+            result['phase']['name'], overhead['Harness']['cpu_percent_mean'],
+            harness['cpu_budget'], '' if overhead['Harness']['within_budget']
+            else ', OVER BUDGET'))
+    if ended['reason'] is not None:
+        print('Ended after {:.0f}s: {}'.format(ended['after'], ended['reason']))
+    return summary
+
+
+def read_ambient(collectors):
+    for (name, fn, slow) in collectors:
+        if name == 'temps':
+            return ambient_reading(fn()['CPU_Temp'])
+    return None
+
+
+def reuse_baseline(phase, baseline, ambient, custname):
+    #stand-in for a skipped idle phase: the cached summary plus where it came
+    #from, under the same temps-<prefix><name>-summary.json
+    name = phase['prefix'] + custname
+    for channel in baseline['summary'].values():
+        dump_summary(name, channel)
+    dump_summary(name, baseline_record(baseline, ambient, True))
+    print('Reusing idle baseline {} ({:.0f}s old)'.format(baseline['name'],
+            time.time() - baseline['recorded_at']))
+
+
+def run_plan(plan, custname, reuse=False, quiet=False, raw=False,
+        channels=None, started=None):
+    #one collector and one schedule for the whole plan: phases switch on the
+    #tick they end, so setup is paid once and there are no gaps between them;
+    #channels restricts the collectors (sources.select_sources) and started
+    #is the time.monotonic() startup is measured from
+    start_ts = int(time.time())
+    print('Start at {}'.format(start_ts))
+    topology = load_topology()
+    probed = probe_sources(topology)  #whatever channels were asked for
+    results = []
+    running = {}
+    phases = []
+    safety = new_safety(plan.get('safety'))
+    #one renderer for the whole run instead of a redraw per tick
+    dash = None if quiet else new_dashboard()
+    say = print if dash is None else lambda line: note_dashboard(dash, line)
+    stress_log = None
+    failing = set()  #collectors whose last read raised
+
+    def begin(first):
+        phase = phases[len(results)]
+        say('Starting phase {}'.format(phase['name']))
+        if burst is not None:
+            set_burst_load(burst, bool(phase['stress']))
+        switch_stress(running, plan, phase, topology, say, stress_log,
+                probed)
+        if ring is not None:
+            set_ring_phase(ring, phase['name'])
+        results.append(dict(phase=phase, first=first, elapsed=0,
+                ticks=phase_ticks(plan, phase), start=time.time(),
+                store=new_store(), stats={}, steady=phase_detector(phase),
+                throttle=new_throttle(**plan.get('throttle', {})),
+                ended=dict(by='duration', after=None, reason=None),
+                read_errors={}))
+
+    def on_tick(i, count, sample, stamp):
+        current = results[-1]
+        t = stamp['wall']
+        #a failed read leaves its channels MISSING; say so once per outage
+        for (name, error) in sorted(stamp['errors'].items()):
+            current['read_errors'][name] = \
+                    current['read_errors'].get(name, 0) + 1
+            if name not in failing:
+                say('{} read failed, sampling on: {}'.format(name, error))
+        failing.clear()
+        failing.update(stamp['errors'])
+        #how long each collector's read took, in ms, as a channel of its own
+        sample['Read_Latency'] = dict((name, seconds * 1000)
+                for (name, seconds) in stamp['latency'].items())
+        #and what the recorder itself cost this tick
+        sample.update(harness_tick(harness, stamp))
+        write_sample(log, i, t, sample, current['phase']['prefix'],
+                stamp['mono'])
+        append_sample(current['store'], t, sample, stamp['mono'])
+        if capture is not None:
+            write_capture_tick(capture, i, t, stamp['mono'],
+                    current['phase']['prefix'])
+        if ring is not None:  #for readers in other processes
+            publish_ring(ring, t, stamp['mono'], sample)
+        #the harness summary is the only reader of the live accumulators
+        update_channel_stats(current['stats'], sample, HARNESS_CHANNELS)
+        throttling = update_throttle(current['throttle'], t, sample)
+        current['elapsed'] = i + 1 - current['first']
+        fired = check_safety(safety, t, sample)
+        if fired is not None:  #stop the load first, everything else after
+            stop_stress(running)
+            current['ended'].update(by='safety', reason='{}: {}'.format(*fired))
+        if dash is not None:
+            alerts = []
+            if fired is not None:
+                alerts.append('SAFETY {}: {}'.format(*fired))
+            if throttling:
+                alerts.append('CPU throttling')
+            if burst is not None and burst['captures']:
+                alerts.append('{} bursts captured, last: {}'.format(
+                        len(burst['captures']),
+                        burst['captures'][-1]['trigger']))
+            update_dashboard(dash, sample)
+            show_tick(dash, plan, results, phases, alerts,
+                    force=fired is not None)
+        if fired is not None:
+            return True
+        done = current['elapsed'] >= current['ticks']
+        steady = current['steady']
+        if steady is not None and update_steady(steady, t, sample):
+            current['ended'].update(by='steady-state', reason=steady['reason'])
+            done = True
+        if done:
+            if len(results) == len(phases):
+                return True
+            begin(i + 1)
+
+    #--capture keeps every source's raw bytes so ./capture.py can parse the
+    #run again later
+    capture = open_capture(custname) if raw else None
+    (collectors, close) = open_collectors(
+            capture_tap(capture) if capture is not None else None, channels,
+            topology)
+    log = open_samplelog(custname)
+    harness = new_harness(started, **plan.get('harness', {}))
+    if dash is not None:  #stress tools print progress all over the screen
+        stress_log = open(TESTDIR + 'temps-{}-stress.log'.format(custname),
+                'x')
+    ring = None
+    if plan.get('ring', {}) is not None:
+        ring = create_ring(**plan.get('ring', {}))
+    burst = None
+    if plan.get('burst') is not None:
+        #a second set of readers so the fast thread never shares a buffer
+        #with the 1 Hz ticks
+        burst = new_burst(custname, **plan['burst'])
+        (burst_collectors, close_burst) = open_collectors(
+                channels=[name for (name, fn, slow) in collectors
+                if name in BURST_COLLECTORS], topology=topology)
+        start_burst(burst, burst_collectors)
+    try:
+        ambient = read_ambient(collectors)
+        if capture is not None:  #not part of any tick
+            capture['pending'] = []
+        baseline = find_baseline(topology['key'], ambient) if reuse else None
+        for phase in plan['phases']:
+            if phase['stress'] and len(unsupported_stress(plan, phase,
+                    probed)) == len(phase['stress']):
+                print('Skipping phase {}: nothing it stresses is here'.format(
+                        phase['name']))
+            elif phase.get('baseline') and baseline is not None:
+                reuse_baseline(phase, baseline, ambient, custname)
+            else:
+                phases.append(phase)
+        count = sum(phase_ticks(plan, phase) for phase in phases)
+        if phases:
+            begin(0)
+            run_schedule(collectors, count, plan['interval'], on_tick=on_tick)
+    finally:
+        stop_stress(running)
+        if burst is not None:
+            bursts = stop_burst(burst)
+            close_burst()
+        close()
+        close_samplelog(log)
+        close_harness(harness)
+        if capture is not None:
+            close_capture(capture)
+        if stress_log is not None:
+            stress_log.close()
+        if ring is not None:
+            close_ring(ring)
+    for result in results:
+        summary = store_phase(result, custname, harness)
+        #only a complete idle phase of a run that passed is worth reusing
+        if result['phase'].get('baseline') and \
+                result['ended']['by'] == 'duration' and safety['fired'] is None:
+            name = result['phase']['prefix'] + custname
+            dump_summary(name, baseline_record(save_baseline(topology['key'],
+                    ambient, name, summary), ambient, False))
+    if results and harness['startup'] is not None:  #once, with the first phase
+        startup = summarize_startup(harness)
+        dump_summary(results[0]['phase']['prefix'] + custname, startup)
+        print('First sample {:.2f}s after start (budget {:.2f}s){}'.format(
+                startup['Startup']['seconds'], harness['startup_budget'],
+                '' if startup['Startup']['within_budget'] else ', OVER BUDGET'))
+    if ring is not None and ring['dropped'] and results:
+        dump_summary(results[-1]['phase']['prefix'] + custname,
+                summarize_ring(ring))
+        print('WARNING: {} columns did not fit the ring {} and were not '
+                'published'.format(len(ring['dropped']), ring['name']))
+    if burst is not None and results:
+        dump_summary(results[-1]['phase']['prefix'] + custname, bursts)
+        print('Captured {} bursts'.format(bursts['Bursts']['captured']))
+    if safety['fired'] is not None:
+        (rule, detail) = safety['fired']
+        name = results[-1]['phase']['prefix'] + custname
+        dump_summary(name, {'Result': {'status': 'FAILED', 'rule': rule,
+                'detail': detail, 'phase': results[-1]['phase']['name']}})
+        print('FAILED in phase {}: {}: {}'.format(
+                results[-1]['phase']['name'], rule, detail))
+        return False
+    return True
+
+
+def main(argv=None):
+    #record-temps.py [--reuse-baseline] [--quiet] [--capture]
+    #[--channels temps,GPU_Temps,...] [--name NAME] [plan.json]
+    started = process_started()
+    args = sys.argv[1:] if argv is None else list(argv)
+    options = {}
+    for option in ('--channels', '--name'):
+        if option in args:
+            i = args.index(option)
+            options[option] = args[i + 1]
+            del args[i:i + 2]
+    reuse = '--reuse-baseline' in args
+    raw = '--capture' in args
+    #no dashboard when asked for or when nobody is watching
+    quiet = '--quiet' in args or not sys.stdout.isatty()
+    args = [arg for arg in args
+            if arg not in ('--reuse-baseline', '--quiet', '--capture')]
+    channels = options['--channels'].split(',') \
+            if '--channels' in options else None
+    plan = load_plan(args[0] if args else DEFAULT_PLAN)
+    custname = options.get('--name')
+    if custname is None:
+        #waiting for an answer is not startup time
+        prompted = time.monotonic()
+        custname = input("What would you like to call this test?\n")
+        started += time.monotonic() - prompted
+    curdate = time.localtime()
+    custname = "{}-{}-{}-{}-{}:{}:{}".format(custname, str(curdate[0]), str(curdate[1]), str(curdate[2]), str(curdate[3]), str(curdate[4]), str(curdate[5]))
+    return 0 if run_plan(plan, custname, reuse, quiet, raw, channels,
+            started) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import json
+import math
+from os import path, makedirs
+
+from stats import QUANTILES, exact_quantile
+from analysis import have_numpy, analyze_channel
+
+TESTDIR = 'testresults/'
+
+
+def clear_screen():
+    print('\x1b[H\x1b[2J', end='')
+
+
+def summarize_temp(items):
+    #pooled over every sample of every core; they are all in memory here, so
+    #the quantiles are exact and P-square stays with the live accumulators
+    values = sorted(v for core in items for v in core if v == v)  #no NaN
+    if not values:  #make sure something happens
+        values = [float(0)]
+    mean = math.fsum(values) / len(values)
+    m2 = math.fsum((v - mean) ** 2 for v in values)
+    summary = dict(max=values[-1], mean=mean, min=values[0],
+            stdev=math.sqrt(m2 / (len(values) - 1))
+            if len(values) > 1 else float(0))
+    for (key, p) in QUANTILES:
+        summary[key] = exact_quantile(values, p)
+    return summary
+
+
+def analyze_temps(raw, j):
+    #per-label summaries plus the combined one under the channel name
+    if have_numpy():
+        return analyze_channel(raw, j)
+    summary = {}
+    for (k, v) in raw.items():
+        summary[k] = summarize_temp([v])
+    summary[j] = summarize_temp(raw.values())
+    return summary
+
+
+def dump_summary(custname, summary):
+    if not path.exists(TESTDIR):
+        makedirs(TESTDIR)
+    filename = TESTDIR + 'temps-{}-summary.json'.format(custname)
+    with open(filename, 'a') as fp:
+        json.dump(summary, fp, indent=4, sort_keys=True)
+
+
+def print_summary(summary):
+    clear_screen()
+    for key in sorted(summary):
+        print('{}:'.format(key))
+        for (k, v) in sorted(summary[key].items()):
+            print('    {}: {:.1f}'.format(k, v))
+
+
+def storesummary(raw, custname, j):
+    summary = analyze_temps(raw, j)
+    dump_summary(custname, summary)
+    print_summary(summary)
+    return summary
+
+
+def store_run(name, raw):
+    #one summary entry per channel; the raw samples go out as the aligned
+    #frame (columns.dump_frame) rather than a file per channel
+    summary = {}
+    for i in raw:
+        summary[i] = storesummary(raw[i], name, i)
+    return summary
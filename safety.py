@@ -0,0 +1,102 @@
+from collections import deque
+
+#per-product overrides go in the plan's "safety" object; a rule set to null
+#is switched off
+DEFAULT_RULES = {
+    #any label of the channel above this many degrees
+    'max_temp': {'CPU_Temp': 100, 'GPU_Temps': 90},
+    #a watched fan at 0 RPM while the hottest CPU sensor rose by `rise`
+    #degrees within `window` seconds
+    'fan_stopped': {'labels': ['CPU'], 'window': 30, 'rise': 5},
+    #a GPU at `min_temp` degrees or more whose fan percentage has not moved
+    #at all for `window` seconds while its temperature rose by `rise` degrees
+    #(a fan pinned at 100% is doing its job; below `min_temp` a zero-RPM or
+    #flat fan curve is the card's own choice)
+    'gpu_fan_stuck': {'window': 60, 'rise': 10, 'min_temp': 75},
+}
+
+
+def new_safety(rules=None):
+    merged = dict(DEFAULT_RULES)
+    for (name, rule) in (rules or {}).items():
+        if rule is None or merged.get(name) is None:
+            merged[name] = rule
+        else:  #only the given thresholds change
+            merged[name] = dict(merged[name], **rule)
+    return dict(rules=merged, cpu=deque(), gpus={}, fired=None)
+
+
+def trim(history, t, window):
+    while history and history[0][0] < t - window:
+        history.popleft()
+
+
+def check_max_temp(rule, sample):
+    for (channel, limit) in sorted(rule.items()):
+        for (k, v) in sample.get(channel, {}).items():
+            if v > limit:
+                return '{} {} at {:.0f} > {}'.format(channel, k, v, limit)
+    return None
+
+
+def check_fan_stopped(safety, rule, t, sample):
+    temps = [v for v in sample.get('CPU_Temp', {}).values() if v == v]
+    cpu = safety['cpu']
+    if temps:
+        cpu.append((t, max(temps)))
+    trim(cpu, t, rule['window'])
+    if not cpu:
+        return None
+    rise = cpu[-1][1] - min(v for (ts, v) in cpu)
+    if rise < rule['rise']:
+        return None
+    for (k, rpm) in sorted(sample.get('Fan_Speed', {}).items()):
+        watched = any(label.lower() in k.lower() for label in rule['labels'])
+        if watched and rpm == 0:
+            return '{} at 0 RPM while CPU rose {:.0f} deg in {}s'.format(
+                    k, rise, rule['window'])
+    return None
+
+
+def check_gpu_fan_stuck(safety, rule, t, sample):
+    temps = sample.get('GPU_Temps', {})
+    fans = sample.get('GPU_Fan', {})
+    for k in sorted(temps):
+        fan = fans.get(k)
+        #NaN is no reading, e.g. the '[N/A]' of a passively cooled card
+        if fan is None or fan != fan or temps[k] != temps[k]:
+            continue
+        history = safety['gpus'].get(k)
+        if history is None:
+            history = safety['gpus'][k] = deque()
+        history.append((t, temps[k], fan))
+        trim(history, t, rule['window'])
+        if history[-1][0] - history[0][0] < rule['window'] * 0.9:
+            continue  #not a full window yet
+        rise = temps[k] - min(temp for (ts, temp, f) in history)
+        fan_values = set(f for (ts, temp, f) in history)
+        if temps[k] >= rule['min_temp'] and rise >= rule['rise'] and \
+                len(fan_values) == 1 and fan < 100:
+            return '{} fan stuck at {:.0f}% while it rose {:.0f} deg'.format(
+                    k, fan, rise)
+    return None
+
+
+def check_safety(safety, t, sample):
+    #(rule, detail) of the first rule that fires on this tick, else None
+    rules = safety['rules']
+    checks = [
+        ('max_temp', lambda rule: check_max_temp(rule, sample)),
+        ('fan_stopped', lambda rule: check_fan_stopped(safety, rule, t,
+                sample)),
+        ('gpu_fan_stuck', lambda rule: check_gpu_fan_stuck(safety, rule, t,
+                sample)),
+    ]
+    for (name, check) in checks:
+        if rules.get(name) is None:
+            continue
+        detail = check(rules[name])
+        if detail is not None:
+            safety['fired'] = (name, detail)
+            return safety['fired']
+    return None
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import json
+from os import path, makedirs
+
+from results import TESTDIR
+from columns import MISSING, new_store, append_sample, store_columns
+
+FSYNC_EVERY = 10
+
+
+def samplelog_name(name):
+    return TESTDIR + 'temps-{}.jsonl'.format(name)
+
+
+def open_samplelog(name):
+    if not path.exists(TESTDIR):
+        makedirs(TESTDIR)
+    fp = open(samplelog_name(name), 'x', buffering=1)  #line buffered
+    return dict(fp=fp, ticks=0)
+
+
+def write_sample(log, i, t, sample, phase='', mono=None):
+    #one line per tick; the line buffer hands it to the kernel straight away
+    #so a crashed run keeps everything and a power cut loses < FSYNC_EVERY
+    line = json.dumps(dict(tick=i, time=t, mono=mono, phase=phase,
+            sample=sample))
+    log['fp'].write(line + '\n')
+    log['ticks'] += 1
+    if log['ticks'] % FSYNC_EVERY == 0:
+        os.fsync(log['fp'].fileno())
+
+
+def close_samplelog(log):
+    log['fp'].flush()
+    os.fsync(log['fp'].fileno())
+    log['fp'].close()
+
+
+def iter_samplelog(filename):
+    with open(filename) as fp:
+        for line in fp:
+            try:
+                yield json.loads(line)
+            except ValueError:  #torn last line of an interrupted run
+                return
+
+
+def load_samplelog(filename):
+    #{phase prefix: columns store}, in the order the phases ran
+    stores = {}
+    for entry in iter_samplelog(filename):
+        store = stores.get(entry.get('phase', ''))
+        if store is None:
+            store = stores[entry.get('phase', '')] = new_store()
+        mono = entry.get('mono')
+        append_sample(store, entry['time'], entry['sample'],
+                MISSING if mono is None else mono)
+    return stores
+
+
+def finalize_samplelog(filename, name):
+    stores = load_samplelog(filename)
+    for (phase, store) in stores.items():
+        store_columns(phase + name, store)
+    return stores
+
+
+if __name__ == '__main__':
+    #rebuild the raw and summary files of a run that never got to finish:
+    #./samplelog.py testresults/temps-<name>.jsonl
+    for filename in sys.argv[1:]:
+        name = path.basename(filename)[len('temps-'):-len('.jsonl')]
+        finalize_samplelog(filename, name)
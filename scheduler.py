@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from columns import MISSING
+
+POOL_SIZE = 4
+
+
+def timed(fn):
+    #(values, seconds the read took, error), measured on whichever thread
+    #runs it; a read that raises has no values and its exception as error
+    start = time.monotonic()
+    try:
+        values = fn()
+        error = None
+    except Exception as e:  #a failed nvidia-smi must not end the run
+        values = None
+        error = e
+    return (values, time.monotonic() - start, error)
+
+
+def sample_once(collectors, pool, shapes=None):
+    #slow collectors (subprocesses, blocking calls) go to the pool while the
+    #fast sysfs/procfs reads run inline on this thread; returns the merged
+    #sample, {collector name: read latency in seconds} and {collector name:
+    #error} of the reads that failed; with a shapes dict, a failed read's
+    #channels and labels from its last good read come out as MISSING
+    futures = [(name, pool.submit(timed, fn))
+            for (name, fn, slow) in collectors if slow]
+    sample = {}
+    latency = {}
+    errors = {}
+    reads = [(name, timed(fn)) for (name, fn, slow) in collectors if not slow]
+    reads += [(name, future.result()) for (name, future) in futures]
+    for (name, (values, latency[name], error)) in reads:
+        if error is not None:
+            errors[name] = '{}: {}'.format(type(error).__name__, error)
+            values = dict((channel, dict.fromkeys(labels, MISSING))
+                    for (channel, labels) in
+                    (shapes or {}).get(name, {}).items())
+        elif shapes is not None:
+            shapes[name] = values
+        sample.update(values)
+    return (sample, latency, errors)
+
+
+def run_schedule(collectors, count, interval, on_tick=None,
+        pool_size=POOL_SIZE):
+    #tick i is due at start + i * interval on the monotonic clock, so
+    #read latency never accumulates; a tick whose successor is already due is
+    #counted as missed instead of stretching the run; on_tick(i, count,
+    #sample, stamp) gets the monotonic and wall clock time the tick's reads
+    #started at, how late that was, the deadlines missed so far, the reads'
+    #latencies and errors, and returning True ends the schedule
+    missed = 0
+    shapes = {}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=pool_size) as pool:
+        for i in range(count):
+            deadline = start + i * interval
+            now = time.monotonic()
+            if now >= deadline + interval and i + 1 < count:
+                missed += 1
+                continue
+            if now < deadline:
+                time.sleep(deadline - now)
+            stamp = dict(mono=time.monotonic(), wall=time.time(),
+                    missed=missed)
+            stamp['late'] = stamp['mono'] - deadline
+            (sample, stamp['latency'], stamp['errors']) = sample_once(
+                    collectors, pool, shapes)
+            if on_tick is not None and on_tick(i, count, sample, stamp):
+                break
+    return missed
@@ -11,7 +11,7 @@ sudo apt install -y \
     nvidia-cuda-dev \
     python3-pip
 
-pip3 install psutil
+pip3 install numpy
 wget http://wili.cc/blog/entries/gpu-burn/gpu_burn-0.9.tar.gz
 tar -zxf gpu_burn-0.9.tar.gz
 make
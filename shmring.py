@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import json
+import time
+import struct
+from array import array
+from multiprocessing import shared_memory, resource_tracker
+
+#plan "ring" object overrides these; "ring": null publishes nothing
+RING_NAME = 'thermal-testing'
+RING_SLOTS = 600  #ticks a late reader can still catch up on
+#channel/label columns are sized from the first tick unless the plan sets
+#`columns`, with room for labels that only show up later; columns past the
+#size are not published and counted in the run's summary
+RING_HEADROOM = 64
+META_BYTES = 64 * 1024  #at least, or twice the first tick's keys
+
+#magic, slots, columns, seq, meta generation, meta length, meta block size,
+#writer pid
+HEADER = struct.Struct('<8sIIQQQQQ')
+MAGIC = b'THRMRING'
+SEQ = struct.Struct('<Q')
+SEQ_OFFSET = 16
+GEN_OFFSET = 24
+META_OFFSET = 64
+MISSING = float('nan')
+
+#layout: header, a JSON meta block ({"keys": [[channel, label], ...],
+#"phases": [[name, first seq], ...]}) and `slots` rows of time, mono and one
+#double per column.
+#seq counts the ticks published; tick n lives in row n % slots and is only
+#valid while seq < n + slots. The meta generation is odd while the writer
+#rewrites the block.
+
+
+def create_ring(name=RING_NAME, slots=RING_SLOTS, columns=None):
+    #without `columns` the segment is only created by the first publish_ring,
+    #once it knows how many there are
+    ring = dict(name=name, shm=None, slots=slots, columns=columns, seq=0,
+            gen=0, keys=[], index={}, phases=[], dropped=set())
+    if columns is not None:
+        allocate_ring(ring, META_BYTES)
+    return ring
+
+
+def allocate_ring(ring, meta_bytes):
+    (name, columns) = (ring['name'], ring['columns'])
+    size = META_OFFSET + meta_bytes + ring['slots'] * (columns + 2) * 8
+    try:
+        shm = shared_memory.SharedMemory(name, create=True, size=size)
+    except FileExistsError:
+        remove_stale_ring(name)
+        shm = shared_memory.SharedMemory(name, create=True, size=size)
+    HEADER.pack_into(shm.buf, 0, MAGIC, ring['slots'], columns, 0, 0, 0,
+            meta_bytes, os.getpid())
+    ring.update(shm=shm, meta_bytes=meta_bytes,
+            data_offset=META_OFFSET + meta_bytes,
+            row=array('d', [MISSING]) * (columns + 2),
+            blank=array('d', [MISSING]) * (columns + 2))
+    write_meta(ring)
+
+
+def writer_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  #someone else's, but running
+        pass
+    return True
+
+
+def remove_stale_ring(name):
+    #only a ring whose writer is gone, e.g. a run that was killed, is
+    #unlinked; a running test or anything that is not a ring is left alone
+    shm = shared_memory.SharedMemory(name)
+    pid = None
+    if shm.size >= HEADER.size:
+        header = HEADER.unpack_from(shm.buf, 0)
+        if header[0] == MAGIC:
+            pid = header[-1]
+    shm.close()
+    if pid is not None and pid != 0 and not writer_alive(pid):
+        shm.unlink()
+        return
+    #not ours to unlink when this process exits either
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    if pid is None:
+        raise ValueError('shared memory {} exists and is not a sample ring; '
+                'give the plan another ring name'.format(name))
+    raise ValueError('ring {} is in use by pid {}; give the plan another '
+            'ring name or remove /dev/shm/{}'.format(name, pid, name))
+
+
+def size_ring(ring, sample):
+    #enough columns and meta block for the first tick's keys, and then some
+    keys = [[channel, k] for (channel, values) in sample.items()
+            for k in values]
+    ring['columns'] = len(keys) + RING_HEADROOM
+    meta_bytes = max(META_BYTES, 2 * len(json.dumps(keys)))
+    allocate_ring(ring, (meta_bytes + 4095) // 4096 * 4096)  #aligned rows
+
+
+def write_meta(ring):
+    buf = ring['shm'].buf
+    meta = json.dumps(dict(keys=ring['keys'], phases=ring['phases'])).encode()
+    if len(meta) > ring['meta_bytes']:
+        raise ValueError('ring meta block full')
+    ring['gen'] += 1
+    SEQ.pack_into(buf, GEN_OFFSET, ring['gen'])
+    buf[META_OFFSET:META_OFFSET + len(meta)] = meta
+    SEQ.pack_into(buf, GEN_OFFSET + 8, len(meta))
+    ring['gen'] += 1
+    SEQ.pack_into(buf, GEN_OFFSET, ring['gen'])
+
+
+def set_ring_phase(ring, phase):
+    #the phase every tick from the next one on belongs to
+    ring['phases'].append([phase, ring['seq']])
+    if ring['shm'] is not None:
+        write_meta(ring)
+
+
+def publish_ring(ring, t, mono, sample):
+    #one tick into the next row, then the sequence counter that makes it
+    #visible; no pickling and nothing allocated per tick but the row fill
+    if ring['shm'] is None:
+        size_ring(ring, sample)
+    row = ring['row']
+    row[:] = ring['blank']
+    row[0] = t
+    row[1] = mono
+    added = False
+    for (channel, values) in sample.items():
+        for (k, v) in values.items():
+            i = ring['index'].get((channel, k))
+            if i is None:
+                if len(ring['keys']) >= ring['columns']:
+                    ring['dropped'].add((channel, k))
+                    continue
+                i = ring['index'][(channel, k)] = len(ring['keys'])
+                ring['keys'].append([channel, k])
+                added = True
+            row[i + 2] = v
+    if added:
+        write_meta(ring)
+    width = (ring['columns'] + 2) * 8
+    offset = ring['data_offset'] + (ring['seq'] % ring['slots']) * width
+    ring['shm'].buf[offset:offset + width] = memoryview(row).cast('B')
+    ring['seq'] += 1
+    SEQ.pack_into(ring['shm'].buf, SEQ_OFFSET, ring['seq'])
+
+
+def close_ring(ring):
+    if ring['shm'] is not None:
+        ring['shm'].close()
+        ring['shm'].unlink()
+
+
+def summarize_ring(ring):
+    #the 'Ring' block of the last phase's summary
+    return {'Ring': {'name': ring['name'], 'columns': ring['columns'],
+            'published': len(ring['keys']), 'dropped': len(ring['dropped']),
+            'dropped_channels': sorted(set(channel
+            for (channel, k) in ring['dropped']))}}
+
+
+def attach_ring(name=RING_NAME):
+    shm = shared_memory.SharedMemory(name)
+    #readers must not unlink the writer's segment when they exit
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    (magic, slots, columns, seq, gen, length, meta_bytes, pid) = \
+            HEADER.unpack_from(shm.buf, 0)
+    if magic != MAGIC:
+        shm.close()
+        raise ValueError('{} is not a sample ring'.format(name))
+    #zero copy view of every row; index (n % slots) * (columns + 2)
+    data = shm.buf[META_OFFSET + meta_bytes:].cast('d')
+    return dict(shm=shm, slots=slots, columns=columns, data=data, gen=None,
+            keys=[], phases=[])
+
+
+def ring_seq(ring):
+    return SEQ.unpack_from(ring['shm'].buf, SEQ_OFFSET)[0]
+
+
+def read_meta(ring):
+    #refresh keys and phases if the writer changed them
+    buf = ring['shm'].buf
+    while True:
+        gen = SEQ.unpack_from(buf, GEN_OFFSET)[0]
+        if gen == ring['gen']:
+            return ring
+        if gen % 2:
+            time.sleep(0)
+            continue
+        length = SEQ.unpack_from(buf, GEN_OFFSET + 8)[0]
+        meta = bytes(buf[META_OFFSET:META_OFFSET + length])
+        if SEQ.unpack_from(buf, GEN_OFFSET)[0] == gen:
+            meta = json.loads(meta)
+            ring.update(gen=gen, keys=[tuple(k) for k in meta['keys']],
+                    phases=meta['phases'])
+            return ring
+
+
+def ring_phase(ring, n):
+    phase = ''
+    for (name, first) in ring['phases']:
+        if first > n:
+            break
+        phase = name
+    return phase
+
+
+def read_ring(ring, since=0):
+    #(seq, time, mono, phase, {(channel, label): value}) of every tick from
+    #`since` on that has not been overwritten yet; pass the last seq + 1 back
+    #in
+    read_meta(ring)
+    seq = ring_seq(ring)
+    width = ring['columns'] + 2
+    first = max(since, seq - ring['slots'] + 1)
+    ticks = []
+    for n in range(first, seq):
+        offset = (n % ring['slots']) * width
+        row = ring['data'][offset:offset + width].tolist()
+        ticks.append((n, row[0], row[1], ring_phase(ring, n), dict((k, v)
+                for (k, v) in zip(ring['keys'], row[2:]) if v == v)))
+    #drop rows the writer lapped while they were being copied
+    valid = ring_seq(ring) - ring['slots'] + 1
+    return [tick for tick in ticks if tick[0] >= valid]
+
+
+def detach_ring(ring):
+    ring['data'].release()
+    ring['shm'].close()
+
+
+if __name__ == '__main__':
+    #follow a running test from another terminal: ./shmring.py [name]
+    ring = attach_ring(sys.argv[1] if len(sys.argv) > 1 else RING_NAME)
+    since = ring_seq(ring)
+    try:
+        while True:
+            for (n, t, mono, phase, values) in read_ring(ring, since):
+                since = n + 1
+                sample = dict(('/'.join(k), v) for (k, v) in values.items())
+                print(json.dumps(dict(seq=n, time=t, phase=phase,
+                        sample=sample)))
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        detach_ring(ring)
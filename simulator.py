@@ -0,0 +1,258 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+from glob import glob
+from os import path, makedirs
+
+#./simulator.py ROOT builds a fake /sys, /proc and /etc under ROOT plus fake
+#sensors, nvidia-smi, stress-ng and gpu_burn executables under ROOT/bin, then
+#keeps the readings moving until interrupted. Point a run at it with
+#THERMAL_ROOT=ROOT PATH=ROOT/bin:$PATH python3 record-temps.py plans/simulated.json
+SIM_RATE = 10  #state updates a second
+SIM_AMBIENT = 25.0
+SIM_RISE = 55.0  #degrees a fully loaded CPU settles above ambient
+SIM_GPU_RISE = 50.0
+SIM_TAU = 30.0  #seconds to get ~63% of the way to the settled temperature
+SIM_GPU_TAU = 20.0
+SIM_BASE_MHZ = 3000
+SIM_TJMAX = 100
+SIM_MAX_RPM = 3000
+
+#the fake executables; state.json is rewritten by the simulator
+EXECUTABLE = '''#!{python}
+import sys, json, time
+with open({state!r}) as fp:
+    state = json.load(fp)
+time.sleep(state['latency'])
+{body}
+'''
+SENSORS = '''print('coretemp-isa-0000')
+print('Adapter: ISA adapter')
+for (label, temp) in state['sensors']:
+    print('{}:  +{:.1f}\\u00b0C  (high = +80.0\\u00b0C, crit = +100.0\\u00b0C)'.format(
+            label, temp))
+'''
+NVIDIA_SMI = '''for gpu in state['gpus']:
+    print('{index}, {temp:.0f}, {power:.2f}, {util:.0f}, {fan:.0f}'.format(**gpu))
+'''
+#loads the simulated CPU or GPU for as long as it runs
+STRESS = '''import os, signal
+flag = {load!r} + '/{kind}.' + str(os.getpid())
+open(flag, 'w').close()
+def stop(signum, frame):
+    os.remove(flag)
+    sys.exit(0)
+signal.signal(signal.SIGTERM, stop)
+signal.signal(signal.SIGINT, stop)
+while True:
+    time.sleep(3600)
+'''
+
+
+def write_file(filename, text):
+    #in place, so readers that keep the file open and pread it see updates
+    fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        data = text.encode()
+        os.pwrite(fd, data, 0)
+        os.ftruncate(fd, len(data))
+    finally:
+        os.close(fd)
+
+
+def write_executable(root, name, body):
+    filename = path.join(root, 'bin', name)
+    with open(filename, 'w') as fp:
+        fp.write(EXECUTABLE.format(python=sys.executable,
+                state=path.join(root, 'sim', 'state.json'), body=body))
+    os.chmod(filename, 0o755)
+
+
+def build_tree(root, cores, gpus, sensors, fans):
+    for d in ['bin', 'etc', 'sim/load', 'proc/sys/kernel/random',
+            'sys/class/hwmon/hwmon0', 'sys/class/hwmon/hwmon1',
+            'sys/class/dmi/id']:
+        makedirs(path.join(root, d), exist_ok=True)
+    write_file(path.join(root, 'etc/machine-id'),
+            'simulated-{}c-{}g\n'.format(cores, gpus))
+    write_file(path.join(root, 'sys/class/dmi/id/board_serial'), 'SIM\n')
+    write_file(path.join(root, 'proc/sys/kernel/random/boot_id'),
+            '{:032x}\n'.format(random.getrandbits(128)))
+    for cpu in range(cores):
+        cpudir = path.join(root, 'sys/devices/system/cpu/cpu{}'.format(cpu))
+        makedirs(path.join(cpudir, 'topology'), exist_ok=True)
+        makedirs(path.join(cpudir, 'cpufreq'), exist_ok=True)
+        write_file(path.join(cpudir, 'topology/physical_package_id'), '0\n')
+        write_file(path.join(cpudir, 'topology/core_id'),
+                '{}\n'.format(cpu // 2))
+    makedirs(path.join(root, 'sys/devices/system/node/node0'), exist_ok=True)
+    for gpu in range(gpus):
+        makedirs(path.join(root,
+                'proc/driver/nvidia/gpus/0000:{:02x}:00.0'.format(gpu + 1)),
+                exist_ok=True)
+    chip = path.join(root, 'sys/class/hwmon/hwmon0')
+    write_file(path.join(chip, 'name'), 'coretemp\n')
+    write_file(path.join(chip, 'temp1_label'), 'Package id 0\n')
+    for i in range(sensors):
+        write_file(path.join(chip, 'temp{}_label'.format(i + 2)),
+                'Core {}\n'.format(i))
+    chip = path.join(root, 'sys/class/hwmon/hwmon1')
+    write_file(path.join(chip, 'name'), 'nct6775\n')
+    for i in range(fans):
+        write_file(path.join(chip, 'fan{}_label'.format(i + 1)),
+                'CPU Fan' if i == 0 else 'System Fan {}'.format(i))
+    write_executable(root, 'sensors', SENSORS)
+    write_executable(root, 'nvidia-smi', NVIDIA_SMI)
+    for (name, kind) in (('stress-ng', 'cpu'), ('gpu_burn', 'gpu')):
+        write_executable(root, name, STRESS.format(
+                load=path.join(root, 'sim', 'load'), kind=kind))
+
+
+def current_load(root, kind):
+    #1.0 while a fake stress tool of that kind is alive
+    for flag in glob(path.join(root, 'sim', 'load', kind + '.*')):
+        try:
+            os.kill(int(flag.rsplit('.', 1)[1]), 0)
+            return 1.0
+        except (OSError, ValueError):  #killed without cleaning up
+            os.remove(flag)
+    return 0.0
+
+
+def new_sim(cores, gpus, sensors, fans, latency, ambient):
+    return dict(latency=latency, ambient=ambient,
+            cpu_temps=[ambient + 10.0] * sensors,
+            gpu_temps=[ambient + 8.0] * gpus,
+            jiffies=[[0] * 8 for cpu in range(cores)], fans=fans, t=0.0)
+
+
+def settle(temp, target, tau, dt):
+    return target + (temp - target) * math.exp(-dt / tau)
+
+
+def step_sim(sim, cpu_load, gpu_load, dt):
+    sim['t'] += dt
+    for (i, temp) in enumerate(sim['cpu_temps']):
+        #cores differ a little, and a slow wobble keeps the curves alive
+        target = sim['ambient'] + 8.0 + cpu_load * SIM_RISE * \
+                (0.9 + 0.2 * ((i * 7919) % 97) / 97.0) + \
+                math.sin(sim['t'] / 20.0 + i)
+        sim['cpu_temps'][i] = settle(temp, target, SIM_TAU, dt) + \
+                random.gauss(0, 0.2)
+    for (i, temp) in enumerate(sim['gpu_temps']):
+        target = sim['ambient'] + 8.0 + gpu_load * SIM_GPU_RISE
+        sim['gpu_temps'][i] = settle(temp, target, SIM_GPU_TAU, dt)
+    hz = 100 * dt  #USER_HZ jiffies this step
+    for counters in sim['jiffies']:
+        busy = cpu_load if cpu_load else random.uniform(0.0, 0.05)
+        counters[0] += int(round(hz * busy * 0.95))
+        counters[2] += int(round(hz * busy * 0.05))
+        counters[3] += int(round(hz * (1 - busy)))
+
+
+def clock_mhz(temp):
+    #throttle linearly over the last 5 degrees below Tjmax
+    over = temp - (SIM_TJMAX - 5)
+    if over <= 0:
+        return SIM_BASE_MHZ
+    return int(SIM_BASE_MHZ * max(0.4, 1 - over * 0.1))
+
+
+def fan_rpm(temp):
+    return int(600 + (SIM_MAX_RPM - 600) *
+            min(max((temp - 35.0) / 45.0, 0.0), 1.0))
+
+
+def write_state(root, sim, cpu_load, gpu_load):
+    temps = sim['cpu_temps']
+    hottest = max(temps) if temps else sim['ambient']
+    chip = path.join(root, 'sys/class/hwmon/hwmon0')
+    write_file(path.join(chip, 'temp1_input'),
+            '{}\n'.format(int(hottest * 1000)))
+    for (i, temp) in enumerate(temps):
+        write_file(path.join(chip, 'temp{}_input'.format(i + 2)),
+                '{}\n'.format(int(temp * 1000)))
+    for i in range(sim['fans']):
+        write_file(path.join(root, 'sys/class/hwmon/hwmon1',
+                'fan{}_input'.format(i + 1)),
+                '{}\n'.format(fan_rpm(hottest) - 100 * i))
+    lines = ['cpu  ' + ' '.join(str(sum(c[i] for c in sim['jiffies']))
+            for i in range(8)) + ' 0 0']
+    cpuinfo = []
+    for (cpu, counters) in enumerate(sim['jiffies']):
+        lines.append('cpu{} {} 0 0'.format(cpu,
+                ' '.join(str(v) for v in counters)))
+        temp = temps[(cpu // 2) % len(temps)] if temps else sim['ambient']
+        mhz = clock_mhz(temp)
+        write_file(path.join(root, 'sys/devices/system/cpu',
+                'cpu{}/cpufreq/scaling_cur_freq'.format(cpu)),
+                '{}\n'.format(mhz * 1000))
+        cpuinfo.append('processor\t: {}\ncpu MHz\t\t: {:.3f}\n'.format(cpu,
+                mhz))
+    lines.append('intr 0\nctxt 0\nbtime 0\nprocesses 0')
+    write_file(path.join(root, 'proc/stat'), '\n'.join(lines) + '\n')
+    write_file(path.join(root, 'proc/cpuinfo'), '\n'.join(cpuinfo))
+    total = 64 * 1024 * 1024
+    available = int(total * (0.9 - 0.3 * cpu_load))
+    write_file(path.join(root, 'proc/meminfo'),
+            'MemTotal: {} kB\nMemFree: {} kB\nMemAvailable: {} kB\n'.format(
+            total, available // 2, available))
+    gpus = [dict(index=i, temp=temp, power=50 + 250 * gpu_load,
+            util=100 * gpu_load, fan=min(100, max(30, (temp - 30) * 2)))
+            for (i, temp) in enumerate(sim['gpu_temps'])]
+    state = dict(latency=sim['latency'], gpus=gpus,
+            sensors=[['Package id 0', hottest]] +
+            [['Core {}'.format(i), t] for (i, t) in enumerate(temps)])
+    filename = path.join(root, 'sim', 'state.json')
+    with open(filename + '.tmp', 'w') as fp:  #executables open it afresh
+        json.dump(state, fp)
+    os.replace(filename + '.tmp', filename)
+
+
+def run_sim(root, sim, rate=SIM_RATE):
+    interval = 1.0 / rate
+    start = time.monotonic()
+    i = 0
+    while True:
+        cpu_load = current_load(root, 'cpu')
+        gpu_load = current_load(root, 'gpu')
+        step_sim(sim, cpu_load, gpu_load, interval)
+        write_state(root, sim, cpu_load, gpu_load)
+        i += 1
+        time.sleep(max(0.0, start + i * interval - time.monotonic()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='fake hardware for '
+            'record-temps.py')
+    parser.add_argument('root')
+    parser.add_argument('--cores', type=int, default=256)
+    parser.add_argument('--gpus', type=int, default=16)
+    parser.add_argument('--sensors', type=int, default=None,
+            help='hwmon core sensors, one per physical core by default')
+    parser.add_argument('--fans', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0,
+            help='ms every sensors/nvidia-smi call takes')
+    parser.add_argument('--ambient', type=float, default=SIM_AMBIENT)
+    parser.add_argument('--rate', type=float, default=SIM_RATE)
+    args = parser.parse_args()
+    root = path.abspath(args.root)
+    sensors = args.sensors if args.sensors is not None else \
+            max(1, args.cores // 2)
+    build_tree(root, args.cores, args.gpus, sensors, args.fans)
+    sim = new_sim(args.cores, args.gpus, sensors, args.fans,
+            args.latency / 1000.0, args.ambient)
+    write_state(root, sim, 0.0, 0.0)
+    print('THERMAL_ROOT={} PATH={}:$PATH'.format(root,
+            path.join(root, 'bin')))
+    sys.stdout.flush()
+    try:
+        run_sim(root, sim, args.rate)
+    except KeyboardInterrupt:
+        pass
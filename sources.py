@@ -0,0 +1,230 @@
+import re
+from glob import glob
+from os import path
+from shutil import which
+from subprocess import check_output
+
+from hwmon import SKIP_LABELS, open_hwmon, pread_hwmon, parse_hwmon, \
+        parse_hwmon_fans, hwmon_labels, close_hwmon
+from procfs import CPUSTAT_CHANNELS, open_proc, pread_proc, close_proc, \
+        open_cpufreq, parse_cpufreq, pread_cpufreq, parse_cpuinfo_clock, \
+        close_cpufreq, parse_meminfo, open_cpustat, parse_cpustat, \
+        cpustat_usage, close_cpustat
+from topology import ROOT, load_topology
+from columns import MISSING
+
+GPU_CHANNELS = ('GPU_Temps', 'GPU_Power', 'GPU_Utilization', 'GPU_Fan')
+GPU_QUERY = ['nvidia-smi', '--format=csv,noheader,nounits',
+        '--query-gpu=index,temperature.gpu,power.draw,utilization.gpu,fan.speed']
+
+
+#subprocesses the collectors have started, for the harness channels
+spawned = dict(count=0)
+
+
+def run_command(cmd):
+    spawned['count'] += 1
+    return check_output(cmd)
+
+
+def read_sensors():
+    return run_command(['sensors'])
+
+
+def read_gpus():
+    return run_command(GPU_QUERY)
+
+
+def iter_temps(text):
+    for line in text.splitlines():
+        if ':' in line and not line.startswith('Adapter:'):
+            (label, tail) = line.split(':')
+            if label in SKIP_LABELS:
+                continue
+            m = re.match(r'\s*\+(\d+)', tail)
+            if m: #check if regex match exists
+                temp = float(m.group(1))
+            else:   #make sure something happens
+                temp = float(0)
+            yield (label, temp)
+
+
+def iter_gpus(text):
+    for line in text.splitlines():
+        fields = [f.strip() for f in line.split(',')]
+        if len(fields) != len(GPU_CHANNELS) + 1:
+            continue
+        label = 'GPU ' + fields[0]
+        values = []
+        for f in fields[1:]:
+            try:
+                values.append(float(f))
+            except ValueError:  #'[N/A]' on passively cooled cards etc.
+                values.append(MISSING)
+        yield (label, values)
+
+
+def parse_temps(text):
+    return dict(iter_temps(text))
+
+
+def parse_gpus(text):
+    gpus = dict((c, {}) for c in GPU_CHANNELS)
+    for (label, values) in iter_gpus(text):
+        for (c, v) in zip(GPU_CHANNELS, values):
+            gpus[c][label] = v
+    return gpus
+
+
+def whole_mhz(clock):
+    return dict((k, int(v)) for (k, v) in clock.items())
+
+
+def source_parser(kind, meta):
+    #one tick's raw bytes of a source -> {channel: {label: value}}; the same
+    #functions parse a live read and a replayed capture
+    if kind == 'hwmon':
+        return lambda data: dict(CPU_Temp=parse_hwmon(meta['labels'], data))
+    if kind == 'sensors':
+        return lambda data: dict(CPU_Temp=parse_temps(data.decode()))
+    if kind == 'cpufreq':
+        return lambda data: dict(CPU_Clockspeed=whole_mhz(
+                parse_cpufreq(meta['cpus'], data)))
+    if kind == 'cpuinfo':
+        return lambda data: dict(CPU_Clockspeed=whole_mhz(
+                parse_cpuinfo_clock(data)))
+    if kind == 'cpustat':
+        #the deltas start from the counters read when the source was opened
+        state = dict(prev=parse_cpustat(meta['prime'].encode()))
+        return lambda data: cpustat_usage(state, data)
+    if kind == 'meminfo':
+        return lambda data: dict(Memory_Utilization=parse_meminfo(data))
+    if kind == 'nvidia-smi':
+        return lambda data: parse_gpus(data.decode())
+    if kind == 'hwmon_fans':
+        return lambda data: dict(Fan_Speed=parse_hwmon_fans(meta['labels'],
+                data))
+    raise ValueError('unknown source kind {}'.format(kind))
+
+
+#the channels each source records, in collector order; --channels picks
+#sources by either name
+SOURCE_CHANNELS = (('temps', ('CPU_Temp',)),
+        ('cpuclock', ('CPU_Clockspeed',)),
+        ('cpuutil', ('CPU_Utilization',) +
+                tuple(c for (c, fields) in CPUSTAT_CHANNELS)),
+        ('memusage', ('Memory_Utilization',)),
+        ('gpus', GPU_CHANNELS),
+        ('fans', ('Fan_Speed',)))
+
+
+def probe_sources(topology, root=ROOT):
+    #{source name: kind} of what this machine can be sampled with, from the
+    #topology and a few stat() calls; nothing is opened or forked, so a
+    #CPU-only box never gets an nvidia-smi collector failing every tick
+    proc = path.join(root, 'proc')
+    kinds = {}
+    if [item for item in topology['hwmon'] if item[0] not in SKIP_LABELS]:
+        kinds['temps'] = 'hwmon'
+    elif which('sensors'):  #no hwmon inputs, fall back to the sensors binary
+        kinds['temps'] = 'sensors'
+    if glob(path.join(root, 'sys/devices/system/cpu/cpu[0-9]*/cpufreq',
+            'scaling_cur_freq')):
+        kinds['cpuclock'] = 'cpufreq'
+    elif path.exists(path.join(proc, 'cpuinfo')):
+        kinds['cpuclock'] = 'cpuinfo'
+    if path.exists(path.join(proc, 'stat')):
+        kinds['cpuutil'] = 'cpustat'
+    if path.exists(path.join(proc, 'meminfo')):
+        kinds['memusage'] = 'meminfo'
+    if topology.get('gpus') and which('nvidia-smi'):
+        kinds['gpus'] = 'nvidia-smi'
+    if [item for item in topology['hwmon_fans']
+            if item[0] not in SKIP_LABELS]:
+        kinds['fans'] = 'hwmon_fans'
+    return kinds
+
+
+def select_sources(kinds, channels=None):
+    #the probed sources `channels` asks for, by source name ('gpus') or by a
+    #channel one records ('GPU_Temps'); all of them when it is None
+    if channels is None:
+        return kinds
+    wanted = set()
+    for channel in channels:
+        names = [name for (name, provides) in SOURCE_CHANNELS
+                if channel == name or channel in provides]
+        if not names:
+            raise ValueError('unknown channel {}'.format(channel))
+        for name in names:
+            if name not in kinds:
+                raise ValueError('{} is not available on this machine'.format(
+                        channel))
+        wanted.update(names)
+    return dict((name, kind) for (name, kind) in kinds.items()
+            if name in wanted)
+
+
+def open_source(name, kind, topology, root=ROOT):
+    #(source, close): name, kind and meta are what source_parser needs to
+    #parse the raw bytes read() returns; slow ones block (subprocesses)
+    proc = path.join(root, 'proc')
+    if kind in ('hwmon', 'hwmon_fans'):
+        files = open_hwmon(inputs=topology[kind])
+        return (dict(name=name, kind=kind,
+                meta=dict(labels=hwmon_labels(files)),
+                read=lambda: pread_hwmon(files), slow=False),
+                lambda: close_hwmon(files))
+    if kind == 'sensors':
+        return (dict(name=name, kind=kind, meta={}, read=read_sensors,
+                slow=True), lambda: None)
+    if kind == 'cpufreq':
+        files = open_cpufreq(path.join(root, 'sys/devices/system/cpu'))
+        return (dict(name=name, kind=kind,
+                meta=dict(cpus=[cpu for (cpu, f) in files]),
+                read=lambda: pread_cpufreq(files), slow=False),
+                lambda: close_cpufreq(files))
+    if kind == 'cpustat':
+        cpustat = open_cpustat(proc)
+        return (dict(name=name, kind=kind,
+                meta=dict(prime=cpustat['prime'].decode()),
+                read=lambda: pread_proc(cpustat['f']), slow=False),
+                lambda: close_cpustat(cpustat))
+    if kind == 'nvidia-smi':
+        return (dict(name=name, kind=kind, meta={}, read=read_gpus,
+                slow=True), lambda: None)
+    #cpuinfo and meminfo are a single procfs file each
+    f = open_proc(path.join(proc, kind), 1 << 16)
+    return (dict(name=name, kind=kind, meta={}, read=lambda: pread_proc(f),
+            slow=False), lambda: close_proc(f))
+
+
+def open_sources(topology, root=ROOT, channels=None):
+    #only the sources this machine has, and of those only the ones
+    #`channels` selects (see select_sources), are opened
+    kinds = select_sources(probe_sources(topology, root), channels)
+    opened = [open_source(name, kinds[name], topology, root)
+            for (name, provides) in SOURCE_CHANNELS if name in kinds]
+
+    def close():
+        for (source, close_source) in opened:
+            close_source()
+    return ([source for (source, close_source) in opened], close)
+
+
+def source_collector(source, tap=None):
+    parse = source_parser(source['kind'], source['meta'])
+    read = source['read'] if tap is None else tap(source)
+    return lambda: parse(read())
+
+
+def open_collectors(tap=None, channels=None, topology=None):
+    #(name, fn, slow): fn returns {channel: {label: value}} for one tick and
+    #slow ones run on the scheduler's thread pool; tap(source) may wrap each
+    #source's read, e.g. to capture the raw bytes
+    if topology is None:
+        topology = load_topology()
+    (sources, close) = open_sources(topology, channels=channels)
+    collectors = [(source['name'], source_collector(source, tap),
+            source['slow']) for source in sources]
+    return (collectors, close)
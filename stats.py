@@ -0,0 +1,124 @@
+import math
+import bisect
+import statistics
+
+QUANTILES = (('median', 0.5), ('p95', 0.95), ('p99', 0.99))
+EXACT_LIMIT = 1024
+
+
+def new_p2(p, exact):
+    #P-square estimator (Jain & Chlamtac 1985): five markers track the
+    #p-quantile of a stream in constant memory; seeded from the first
+    #EXACT_LIMIT samples, already sorted
+    last = len(exact)
+    np = [1, 1 + (last - 1) * p / 2, 1 + (last - 1) * p,
+            1 + (last - 1) * (1 + p) / 2, last]
+    n = [int(round(pos)) for pos in np]
+    return dict(p=p, q=[exact[i - 1] for i in n], n=n, np=np,
+            dn=[0, p / 2, p, (1 + p) / 2, 1])
+
+
+def update_p2(est, x):
+    q = est['q']
+    n = est['n']
+    if x < q[0]:
+        q[0] = x
+        k = 0
+    elif x >= q[4]:
+        q[4] = x
+        k = 3
+    else:
+        k = bisect.bisect_right(q, x) - 1
+    for i in range(k + 1, 5):
+        n[i] += 1
+    for i in range(5):
+        est['np'][i] += est['dn'][i]
+    for i in (1, 2, 3):
+        d = est['np'][i] - n[i]
+        if (d >= 1 and n[i + 1] - n[i] > 1) or \
+                (d <= -1 and n[i - 1] - n[i] < -1):
+            d = 1 if d > 0 else -1
+            qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i])
+                    / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1])
+                    / (n[i] - n[i - 1]))
+            if not q[i - 1] < qp < q[i + 1]:
+                qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+            q[i] = qp
+            n[i] += d
+
+
+def exact_quantile(exact, p):
+    if not exact:
+        return float(0)
+    if p == 0.5:
+        return statistics.median(exact)
+    pos = p * (len(exact) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(exact) - 1)
+    return exact[lo] + (exact[hi] - exact[lo]) * (pos - lo)
+
+
+def new_stats():
+    #quantiles stay exact over a sorted buffer until EXACT_LIMIT samples,
+    #then hand over to P-square markers
+    return dict(n=0, mean=0.0, m2=0.0, min=math.inf, max=-math.inf,
+            exact=[], quantiles=None)
+
+
+def update_stats(acc, x):
+    if x != x:  #NaN padding from the column store
+        return
+    #Welford's update keeps mean and variance stable over long soaks
+    acc['n'] += 1
+    delta = x - acc['mean']
+    acc['mean'] += delta / acc['n']
+    acc['m2'] += delta * (x - acc['mean'])
+    if x < acc['min']:
+        acc['min'] = x
+    if x > acc['max']:
+        acc['max'] = x
+    if acc['quantiles'] is not None:
+        for (key, est) in acc['quantiles']:
+            update_p2(est, x)
+    elif len(acc['exact']) < EXACT_LIMIT:
+        bisect.insort(acc['exact'], x)
+    else:
+        acc['quantiles'] = [(key, new_p2(p, acc['exact']))
+                for (key, p) in QUANTILES]
+        acc['exact'] = None
+        for (key, est) in acc['quantiles']:
+            update_p2(est, x)
+
+
+def update_channel_stats(stats, sample, channels):
+    #one pooled accumulator per channel in `channels`, fed every label's
+    #value each tick; the rest are summarized from the stored columns at
+    #the end of the phase, so accumulating them would only cost tick time
+    for channel in channels:
+        values = sample.get(channel)
+        if values is None:
+            continue
+        acc = stats.get(channel)
+        if acc is None:
+            acc = stats[channel] = new_stats()
+        for v in values.values():
+            update_stats(acc, v)
+
+
+def summarize_stats(acc):
+    if acc['n'] == 0:  #make sure something happens
+        summary = dict(max=float(0), mean=float(0), min=float(0),
+                stdev=float(0))
+    else:
+        summary = dict(max=acc['max'], mean=acc['mean'], min=acc['min'],
+                stdev=math.sqrt(acc['m2'] / (acc['n'] - 1))
+                if acc['n'] > 1 else float(0))
+    if acc['quantiles'] is None:
+        for (key, p) in QUANTILES:
+            summary[key] = exact_quantile(acc['exact'], p)
+    else:
+        for (key, est) in acc['quantiles']:
+            summary[key] = est['q'][2]
+    return summary
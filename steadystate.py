@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+
+import sys
+import math
+from collections import deque
+
+STEADY_CHANNELS = ('CPU_Temp', 'GPU_Temps')
+STEADY_WINDOW = 120  #seconds of history the slope and spread are taken over
+STEADY_SLOPE = 0.5  #degrees per minute
+STEADY_STDEV = 1.0  #degrees
+STEADY_HOLD = 60  #seconds every channel has to stay stable
+#how a channel's labels are combined each tick before the fit: None judges
+#every label on its own, 'max' or 'mean' one value per channel, which keeps
+#dozens of cores of whole-degree noise from always holding a short window open
+AGGREGATES = {'max': max,
+        'mean': lambda values: math.fsum(values) / len(values)}
+
+
+def new_steady(window=STEADY_WINDOW, slope=STEADY_SLOPE, stdev=STEADY_STDEV,
+        hold=STEADY_HOLD, channels=STEADY_CHANNELS, aggregate=None):
+    if aggregate is not None and aggregate not in AGGREGATES:
+        raise ValueError('unknown steady aggregate {}'.format(aggregate))
+    return dict(window=window, slope=slope, stdev=stdev, hold=hold,
+            channels=channels, aggregate=aggregate, labels={}, since=None, t0=None, reason=None,
+            peak_rise=None, peak_fall=None)
+
+
+def new_window():
+    #running sums for a least-squares fit over (t, v) pairs in the window
+    return dict(points=deque(), n=0, st=0.0, sv=0.0, stt=0.0, stv=0.0,
+            svv=0.0)
+
+
+def push_window(w, t, v):
+    w['points'].append((t, v))
+    w['n'] += 1
+    w['st'] += t
+    w['sv'] += v
+    w['stt'] += t * t
+    w['stv'] += t * v
+    w['svv'] += v * v
+
+
+def pop_window(w):
+    (t, v) = w['points'].popleft()
+    w['n'] -= 1
+    w['st'] -= t
+    w['sv'] -= v
+    w['stt'] -= t * t
+    w['stv'] -= t * v
+    w['svv'] -= v * v
+
+
+def fit_window(w):
+    #(slope per second, standard deviation) of the samples in the window
+    n = w['n']
+    stt = w['stt'] - w['st'] * w['st'] / n
+    svv = max(w['svv'] - w['sv'] * w['sv'] / n, 0.0)
+    stv = w['stv'] - w['st'] * w['sv'] / n
+    slope = stv / stt if stt > 0 else 0.0
+    stdev = math.sqrt(svv / (n - 1)) if n > 1 else 0.0
+    return (slope, stdev)
+
+
+def label_stable(detector, w):
+    points = w['points']
+    if w['n'] < 3 or points[-1][0] - points[0][0] < detector['window'] * 0.9:
+        return False  #not enough history yet
+    (slope, stdev) = fit_window(w)
+    #the steepest warming and cooling seen are cooling diagnostics in their
+    #own right
+    if detector['peak_rise'] is None or slope * 60 > detector['peak_rise']:
+        detector['peak_rise'] = slope * 60
+    if detector['peak_fall'] is None or slope * 60 < detector['peak_fall']:
+        detector['peak_fall'] = slope * 60
+    return abs(slope * 60) <= detector['slope'] and \
+            stdev <= detector['stdev']
+
+
+def watched(detector, values):
+    #(label, value) pairs one channel feeds the fits this tick, NaN dropped
+    items = [(k, v) for (k, v) in values.items() if v == v]
+    aggregate = detector['aggregate']
+    if aggregate is None or not items:
+        return items
+    return [(aggregate, AGGREGATES[aggregate]([v for (k, v) in items]))]
+
+
+def update_steady(detector, t, sample):
+    #feed one tick; True once every watched label has held still for `hold`
+    if detector['t0'] is None:
+        detector['t0'] = t
+    t -= detector['t0']  #keeps the running sums well conditioned
+    stable = True
+    seen = False
+    for channel in detector['channels']:
+        for (k, v) in watched(detector, sample.get(channel, {})):
+            seen = True
+            w = detector['labels'].get((channel, k))
+            if w is None:
+                w = detector['labels'][(channel, k)] = new_window()
+            push_window(w, t, v)
+            while w['points'][0][0] < t - detector['window']:
+                pop_window(w)
+            if not label_stable(detector, w):
+                stable = False
+    if not (stable and seen):
+        detector['since'] = None
+        return False
+    if detector['since'] is None:
+        detector['since'] = t
+    if t - detector['since'] >= detector['hold']:
+        limits = '{} deg/min'.format(detector['slope'])
+        if detector['stdev'] != math.inf:
+            limits += ' and {} deg stdev'.format(detector['stdev'])
+        what = 'every {} label' if detector['aggregate'] is None else \
+                'the {} of each {{}} channel'.format(detector['aggregate'])
+        detector['reason'] = '{} under {} over {}s for {}s'.format(
+                what.format('/'.join(detector['channels'])), limits,
+                detector['window'], detector['hold'])
+        return True
+    return False
+
+
+def find_steady(store, **kwargs):
+    #offline: seconds into a recorded columns store at which the rule would
+    #have stopped the run, or None
+    detector = new_steady(**kwargs)
+    times = store['time']
+    for i in range(len(times)):
+        sample = {}
+        for ((channel, k), column) in store['columns'].items():
+            sample.setdefault(channel, {})[k] = column[i]
+        if update_steady(detector, times[i], sample):
+            return times[i] - times[0]
+    return None
+
+
+if __name__ == '__main__':
+    #./steadystate.py testresults/temps-*-columns.bin
+    from columns import load_columns
+    for filename in sys.argv[1:]:
+        print(filename, find_steady(load_columns(filename)))
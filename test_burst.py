@@ -0,0 +1,41 @@
+from burst import new_burst, set_burst_load, check_triggers
+
+
+def idle_dvfs(seconds=30, rate=20):
+    #an idle box: cores hop between their lowest and boost clocks every half
+    #second and the fan curve steps down as the CPU cools
+    for i in range(seconds * rate):
+        clock = 800.0 if (i // (rate // 2)) % 2 else 3500.0
+        yield dict(CPU_Temp={'Core 0': 38.0},
+                CPU_Clockspeed={'Core 0': clock},
+                Fan_Speed={'CPU Fan': 1200.0 if i < seconds * rate // 2
+                else 450.0})
+
+
+def triggers(burst, samples):
+    fired = []
+    for (i, sample) in enumerate(samples):
+        trigger = check_triggers(burst, sample)
+        if trigger is not None:
+            fired.append(trigger)
+        burst['ring'].append((i / float(burst['rate']), sample))
+    return fired
+
+
+def test_idle_dvfs_does_not_burst():
+    assert triggers(new_burst('test'), idle_dvfs()) == []
+
+
+def test_loaded_clock_drop_bursts():
+    burst = new_burst('test')
+    set_burst_load(burst, True)
+    fired = triggers(burst, idle_dvfs())
+    assert fired[0] == 'CPU_Clockspeed Core 0 dropped 3500 -> 800'
+    assert any(trigger.startswith('Fan_Speed CPU Fan') for trigger in fired)
+
+
+def test_temp_jump_bursts_idle():
+    samples = list(idle_dvfs(5))
+    samples[-1] = dict(samples[-1], CPU_Temp={'Core 0': 45.0})
+    assert triggers(new_burst('test'), samples) == \
+            ['CPU_Temp Core 0 jumped 38 -> 45']
@@ -0,0 +1,21 @@
+from procfs import parse_cpustat, cpustat_usage
+
+
+def stat(*cores):
+    #/proc/stat with (user, idle) jiffies per core
+    lines = ['cpu  0 0 0 0 0 0 0 0 0 0']
+    lines += ['cpu{} {} 0 0 {} 0 0 0 0 0 0'.format(n, user, idle)
+            for (n, (user, idle)) in enumerate(cores)]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def test_first_tick_after_prime():
+    #tick 0 fires a few ms after the counters were primed: no real delta
+    #yet, so MISSING, and the next tick still measures from the prime
+    cpustat = dict(prev=parse_cpustat(stat((1000, 5000), (2000, 4000))))
+    usage = cpustat_usage(cpustat, stat((1000, 5001), (2000, 4000)))
+    assert all(v != v for v in usage['CPU_Utilization'].values())
+    assert all(v != v for v in usage['CPU_User'].values())
+    usage = cpustat_usage(cpustat, stat((1025, 5075), (2100, 4000)))
+    assert usage['CPU_Utilization'] == {'Core: 0': 25.0, 'Core: 1': 100.0}
+    assert usage['CPU_User'] == {'Core: 0': 25.0, 'Core: 1': 100.0}
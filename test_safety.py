@@ -0,0 +1,78 @@
+from safety import new_safety, check_safety
+from sources import parse_gpus
+
+
+def run(safety, samples):
+    #(tick, rule, detail) of the first rule that fired on a stream of
+    #one-second ticks, else None
+    for (t, sample) in enumerate(samples):
+        fired = check_safety(safety, float(t), sample)
+        if fired is not None:
+            return (t,) + fired
+    return None
+
+
+def gpu_stream(fan, seconds=120, start=35.0, rise=0.3):
+    #gpu_burn warming one card by `rise` degrees a second
+    for t in range(seconds):
+        line = '0, {:.0f}, 250.00, 100, {}'.format(start + rise * t, fan)
+        yield parse_gpus(line)
+
+
+def cpu_stream(rpm, seconds=60, start=40.0, rise=0.5):
+    for t in range(seconds):
+        yield dict(CPU_Temp={'Package id 0': start + rise * t},
+                Fan_Speed={'CPU Fan': rpm, 'System Fan 1': 900})
+
+
+def test_max_temp():
+    samples = [dict(CPU_Temp={'Core 0': 60.0 + t}) for t in range(60)]
+    (t, rule, detail) = run(new_safety(), samples)
+    assert (t, rule) == (41, 'max_temp')
+    assert 'Core 0' in detail
+
+
+def test_max_temp_override():
+    samples = [dict(CPU_Temp={'Core 0': 60.0 + t}) for t in range(60)]
+    assert run(new_safety({'max_temp': {'CPU_Temp': 80}}), samples)[0] == 21
+    assert run(new_safety({'max_temp': None}), samples) is None
+
+
+def test_fan_stopped():
+    (t, rule, detail) = run(new_safety(), cpu_stream(0))
+    assert (t, rule) == (10, 'fan_stopped')
+    assert detail.startswith('CPU Fan')
+    assert run(new_safety(), cpu_stream(1200)) is None
+    assert run(new_safety({'fan_stopped': {'rise': 50}}), cpu_stream(0)) \
+            is None
+
+
+def test_gpu_fan_stuck():
+    #a card already warm from an earlier phase climbs past min_temp
+    (t, rule, detail) = run(new_safety(), gpu_stream('30', start=60.0))
+    assert rule == 'gpu_fan_stuck'
+    assert t >= 54
+    assert detail.startswith('GPU 0 fan stuck at 30%')
+    assert run(new_safety({'gpu_fan_stuck': None}),
+            gpu_stream('30', seconds=90, start=60.0)) is None
+
+
+def test_gpu_zero_rpm():
+    #zero-RPM and flat fan curves hold still while the card is cool
+    assert run(new_safety(), gpu_stream('0')) is None
+    assert run(new_safety(), gpu_stream('30')) is None
+    (t, rule, detail) = run(new_safety(), gpu_stream('0', start=60.0))
+    assert rule == 'gpu_fan_stuck'
+
+
+def test_gpu_fan_pinned():
+    #flat out is the fan doing its job
+    assert run(new_safety(), gpu_stream('100')) is None
+
+
+def test_passive_gpu():
+    #no fan to report: '[N/A]' parses as missing, never as a stuck 0%
+    sample = parse_gpus('0, 35, 60.00, 0, [N/A]')
+    assert sample['GPU_Fan']['GPU 0'] != sample['GPU_Fan']['GPU 0']
+    assert sample['GPU_Temps']['GPU 0'] == 35.0
+    assert run(new_safety(), gpu_stream('[N/A]')) is None
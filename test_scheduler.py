@@ -0,0 +1,41 @@
+from subprocess import CalledProcessError
+from concurrent.futures import ThreadPoolExecutor
+
+from scheduler import sample_once, run_schedule
+
+
+def flaky(fails):
+    #a GPU collector whose nvidia-smi exits non-zero on the given calls
+    calls = dict(n=0)
+
+    def read():
+        calls['n'] += 1
+        if calls['n'] in fails:
+            raise CalledProcessError(1, ['nvidia-smi'])
+        return dict(GPU_Temps={'GPU 0': 40.0, 'GPU 1': 41.0})
+    return read
+
+
+def test_failed_read_is_missing():
+    collectors = [('cpu', lambda: dict(CPU_Temp={'Core 0': 50.0}), False),
+            ('gpus', flaky({2}), True)]
+    shapes = {}
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        (sample, latency, errors) = sample_once(collectors, pool, shapes)
+        assert errors == {}
+        (sample, latency, errors) = sample_once(collectors, pool, shapes)
+    assert set(errors) == {'gpus'}
+    assert errors['gpus'].startswith('CalledProcessError')
+    assert sample['CPU_Temp'] == {'Core 0': 50.0}
+    assert sorted(sample['GPU_Temps']) == ['GPU 0', 'GPU 1']
+    assert all(v != v for v in sample['GPU_Temps'].values())
+    assert set(latency) == {'cpu', 'gpus'}
+
+
+def test_schedule_keeps_sampling():
+    ticks = []
+    collectors = [('gpus', flaky({1, 3}), True)]
+    run_schedule(collectors, 5, 0.001,
+            on_tick=lambda i, count, sample, stamp: ticks.append(
+            sorted(stamp['errors'])))
+    assert ticks == [['gpus'], [], ['gpus'], [], []]
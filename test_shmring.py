@@ -0,0 +1,60 @@
+import os
+import subprocess
+from multiprocessing import shared_memory
+
+import pytest
+
+from shmring import HEADER, create_ring, publish_ring, close_ring, \
+        attach_ring, read_ring, detach_ring
+
+SAMPLE = dict(CPU_Temp={'Core 0': 50.0})
+
+
+def ring_name(test):
+    return 'thermal-test-{}-{}'.format(test, os.getpid())
+
+
+def test_live_ring_is_kept():
+    first = create_ring(ring_name('live'), slots=8)
+    publish_ring(first, 1.0, 1.0, SAMPLE)
+    try:
+        with pytest.raises(ValueError) as e:
+            publish_ring(create_ring(first['name'], slots=8), 2.0, 2.0,
+                    SAMPLE)
+        assert 'in use by pid {}'.format(os.getpid()) in str(e.value)
+        reader = attach_ring(first['name'])
+        assert [tick[0] for tick in read_ring(reader)] == [0]
+        detach_ring(reader)
+    finally:
+        close_ring(first)
+
+
+def test_killed_writer_is_replaced():
+    stale = create_ring(ring_name('stale'), slots=8)
+    publish_ring(stale, 1.0, 1.0, SAMPLE)
+    gone = subprocess.Popen(['true'])
+    gone.wait()
+    #as if the run that made it had been killed
+    stale['shm'].buf[HEADER.size - 8:HEADER.size] = \
+            gone.pid.to_bytes(8, 'little')
+    stale['shm'].close()
+    ring = create_ring(stale['name'], slots=8)
+    try:
+        publish_ring(ring, 2.0, 2.0, SAMPLE)
+        reader = attach_ring(ring['name'])
+        assert [tick[1] for tick in read_ring(reader)] == [2.0]
+        detach_ring(reader)
+    finally:
+        close_ring(ring)
+
+
+def test_foreign_segment_is_kept():
+    name = ring_name('foreign')
+    other = shared_memory.SharedMemory(name, create=True, size=4096)
+    try:
+        with pytest.raises(ValueError) as e:
+            create_ring(name, slots=8, columns=4)
+        assert 'not a sample ring' in str(e.value)
+    finally:
+        other.close()
+        other.unlink()
@@ -0,0 +1,88 @@
+import math
+import random
+import statistics
+
+from stats import EXACT_LIMIT, QUANTILES, new_stats, update_stats, \
+        summarize_stats
+from results import summarize_temp, analyze_temps
+from analysis import have_numpy, analyze_channel
+
+PERCENT = dict(median=50, p95=95, p99=99)
+
+
+def warmup(n=3600, tau=600.0, whole=False, seed=1):
+    #an hour of a core warming from 40 to 85 degrees under load, with sensor
+    #noise; whole=True rounds the way hwmon millidegrees often come in
+    rng = random.Random(seed)
+    values = [40 + 45 * (1 - math.exp(-t / tau)) + rng.gauss(0, 0.3)
+            for t in range(n)]
+    return [float(round(v)) for v in values] if whole else values
+
+
+def batch(values):
+    #the exact answers, straight from the statistics module
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    summary = dict(max=max(values), mean=statistics.fmean(values),
+            min=min(values), stdev=statistics.stdev(values))
+    for (key, p) in QUANTILES:
+        summary[key] = statistics.median(values) if key == 'median' else \
+                cuts[PERCENT[key] - 1]
+    return summary
+
+
+def live(values):
+    acc = new_stats()
+    for v in values:
+        update_stats(acc, v)
+    return summarize_stats(acc)
+
+
+def assert_close(summary, expected, tolerance):
+    for (key, v) in expected.items():
+        assert abs(summary[key] - v) <= tolerance, (key, summary[key], v)
+
+
+def test_live_exact_below_limit():
+    values = warmup(EXACT_LIMIT)
+    assert_close(live(values), batch(values), 1e-9)
+
+
+def test_live_against_batch():
+    #moments stay exact, P-square quantiles within 5% of the range
+    for whole in (False, True):
+        values = warmup(whole=whole)
+        expected = batch(values)
+        summary = live(values)
+        assert_close(summary, dict((key, expected[key])
+                for key in ('max', 'mean', 'min', 'stdev')), 1e-9)
+        span = expected['max'] - expected['min']
+        assert_close(summary, dict((key, expected[key])
+                for (key, p) in QUANTILES), 0.05 * span)
+
+
+def test_stored_against_batch():
+    #every sample is in memory, so nothing is estimated
+    for whole in (False, True):
+        cores = [warmup(whole=whole, seed=seed) for seed in range(4)]
+        assert_close(summarize_temp(cores),
+                batch([v for core in cores for v in core]), 1e-9)
+
+
+def test_stored_skips_padding():
+    values = warmup(100)
+    assert_close(summarize_temp([values + [float('nan')] * 10]),
+            batch(values), 1e-9)
+
+
+def test_fallback_matches_numpy():
+    if not have_numpy():
+        return
+    raw = dict(('Core {}'.format(seed), warmup(seed=seed))
+            for seed in range(4))
+    raw['Core 3'] = raw['Core 3'][:3000] + [float('nan')] * 600
+    expected = analyze_channel(raw, 'CPU_Temp')
+    summary = dict((k, summarize_temp([v])) for (k, v) in raw.items())
+    summary['CPU_Temp'] = summarize_temp(raw.values())
+    for (k, v) in expected.items():
+        assert_close(summary[k], v, 1e-9)
+    assert set(analyze_temps(raw, 'CPU_Temp')) == set(summary)
@@ -0,0 +1,45 @@
+import math
+import random
+
+from steadystate import new_steady, update_steady
+from testplan import load_plan, phase_detector
+
+
+def settling(seed, cores=32, gpus=2, tau=8.0):
+    #a many-core box and its GPUs settling under load, each label with its
+    #own offset and sensor noise, in the whole degrees hwmon usually reports
+    rng = random.Random(seed)
+    for t in range(300):
+        rise = 1 - math.exp(-t / tau)
+        yield (float(t), dict(
+                CPU_Temp=dict(('Core {}'.format(c),
+                float(round(40 + 30 * rise + c % 4 + rng.gauss(0, 0.5))))
+                for c in range(cores)),
+                GPU_Temps=dict(('GPU {}'.format(g),
+                float(round(35 + 40 * rise + rng.gauss(0, 0.5))))
+                for g in range(gpus))))
+
+
+def fires(detector, samples):
+    for (t, sample) in samples:
+        if update_steady(detector, t, sample):
+            return t
+    return None
+
+
+def test_default_warmup_settles():
+    #the shipped warmup rule ends the phase once the curves level off, well
+    #inside its 90 seconds and not while they are still climbing
+    warmup = [phase for phase in load_plan()['phases']
+            if phase['name'] == 'warmup'][0]
+    for seed in range(10):
+        t = fires(phase_detector(warmup), settling(seed))
+        assert t is not None and 45 <= t <= warmup['duration'], (seed, t)
+
+
+def test_per_label_never_settles():
+    #the old 20 second window per label: one of 34 noisy labels is always
+    #tilted past the slope limit
+    for seed in range(3):
+        detector = new_steady(window=20, slope=1.0, stdev=math.inf, hold=0)
+        assert fires(detector, settling(seed)) is None
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from testplan import load_plan, switch_stress, stop_stress
+
+TOPOLOGY = dict(cpus=2, numa_nodes=1, dimms=None)
+
+
+def write_plan(tmp_path, **fields):
+    plan = dict(commands={'cpu': ['sleep', '30'],
+            'gpu': ['./no-such-gpu_burn', '30']},
+            requires={'gpu': 'gpus'},
+            phases=[dict(name='stress', duration=10, stress=['cpu', 'gpu'])])
+    plan.update(fields)
+    filename = tmp_path / 'plan.json'
+    filename.write_text(json.dumps(plan))
+    return load_plan(str(filename))
+
+
+def test_no_gpu_skips_gpu_stress(tmp_path):
+    plan = write_plan(tmp_path)
+    (running, lines) = ({}, [])
+    try:
+        switch_stress(running, plan, plan['phases'][0], TOPOLOGY,
+                lines.append, sources={'cpuutil': 'cpustat'})
+        assert list(running) == ['cpu']
+        assert lines[0] == 'Skipping gpu stress: no gpus source'
+    finally:
+        stop_stress(running)
+
+
+def test_failed_start_is_reported(tmp_path):
+    plan = write_plan(tmp_path)
+    (running, lines) = ({}, [])
+    try:
+        switch_stress(running, plan, plan['phases'][0], TOPOLOGY,
+                lines.append, sources={'gpus': 'nvidia-smi'})
+        assert list(running) == ['cpu']
+        assert lines[-1].startswith('Could not start gpu stress: ')
+    finally:
+        stop_stress(running)
+
+
+@pytest.mark.parametrize('phase,error', [
+        (dict(duration=0), 'positive duration, not 0'),
+        (dict(duration='60'), 'positive duration, not "60"'),
+        (dict(), 'positive duration, not null'),
+        (dict(duration=60, until={'stedy': {}}), 'unknown until stedy'),
+        (dict(duration=60, until={'steady': {'widow': 30}}),
+                'unknown steady widow'),
+        (dict(duration=60, until={'steady': {'aggregate': 'min'}}),
+                'unknown steady aggregate min')])
+def test_bad_phase(tmp_path, phase, error):
+    phase['name'] = 'warmup'
+    with pytest.raises(ValueError) as e:
+        write_plan(tmp_path, phases=[phase])
+    assert str(e.value).startswith('phase warmup')
+    assert error in str(e.value)
@@ -0,0 +1,128 @@
+import json
+import math
+import inspect
+from os import path
+import multiprocessing
+from subprocess import Popen
+
+from steadystate import new_steady
+from topology import stress_vm_workers
+
+DEFAULT_PLAN = path.join(path.dirname(path.abspath(__file__)), 'plans',
+        'default.json')
+#what a phase's 'until' may hold, and the keys of its 'steady' rule
+UNTIL_KEYS = ('steady',)
+STEADY_KEYS = tuple(inspect.signature(new_steady).parameters)
+
+
+def load_plan(filename=DEFAULT_PLAN):
+    with open(filename) as fp:
+        plan = json.load(fp)
+    plan.setdefault('interval', 1)
+    plan.setdefault('commands', {})
+    #{command: source} of stress that needs hardware a probe may not find
+    plan.setdefault('requires', {})
+    for phase in plan['phases']:
+        phase.setdefault('prefix', phase['name'] + '-')
+        phase.setdefault('stress', [])
+        phase.setdefault('until', {})
+        check_phase(phase)
+        for name in phase['stress']:
+            if name not in plan['commands']:
+                raise ValueError('phase {} runs unknown command {}'.format(
+                        phase['name'], name))
+    return plan
+
+
+def check_phase(phase):
+    #a typo in a plan should stop the run before any stress starts, not be
+    #ignored or blow up phases into it
+    duration = phase.get('duration')
+    if isinstance(duration, bool) or not isinstance(duration, (int, float)) \
+            or not duration > 0:
+        raise ValueError('phase {} needs a positive duration, not {}'.format(
+                phase['name'], json.dumps(duration)))
+    for key in phase['until']:
+        if key not in UNTIL_KEYS:
+            raise ValueError('phase {} has unknown until {}'.format(
+                    phase['name'], key))
+    steady = phase['until'].get('steady', {})
+    if not isinstance(steady, dict):
+        raise ValueError('phase {} until steady is not an object'.format(
+                phase['name']))
+    for key in steady:
+        if key not in STEADY_KEYS:
+            raise ValueError('phase {} has unknown steady {}'.format(
+                    phase['name'], key))
+    try:
+        phase_detector(phase)
+    except ValueError as e:
+        raise ValueError('phase {}: {}'.format(phase['name'], e))
+
+
+def plan_seconds(plan):
+    return sum(phase['duration'] for phase in plan['phases'])
+
+
+def phase_ticks(plan, phase):
+    return max(int(round(phase['duration'] / plan['interval'])), 1)
+
+
+def phase_detector(phase):
+    #'until': {'steady': {...new_steady() arguments...}}, null stdev means
+    #only the slope counts
+    params = phase['until'].get('steady')
+    if params is None:
+        return None
+    params = dict(params)
+    if 'stdev' in params and params['stdev'] is None:
+        params['stdev'] = math.inf
+    if 'channels' in params:
+        params['channels'] = tuple(params['channels'])
+    return new_steady(**params)
+
+
+def stress_command(plan, name, topology):
+    fields = dict(cpus=topology['cpus'] or multiprocessing.cpu_count(),
+            vm_workers=stress_vm_workers(topology),
+            plan_seconds=int(math.ceil(plan_seconds(plan))))
+    return [arg.format(**fields) for arg in plan['commands'][name]]
+
+
+def unsupported_stress(plan, phase, sources):
+    #the phase's stress commands whose required source (plan 'requires')
+    #sources.probe_sources did not find, e.g. gpu_burn on a CPU-only box
+    return [name for name in phase['stress'] if name in plan['requires']
+            and plan['requires'][name] not in sources]
+
+
+def switch_stress(running, plan, phase, topology, say=print, out=None,
+        sources=None):
+    #stress that carries over into the next phase keeps running, so there is
+    #no gap in the load between e.g. warmup and stress; `out` takes the
+    #commands' output when the terminal is busy with the dashboard; a command
+    #that is unsupported or fails to start is reported and the phase goes on
+    skip = unsupported_stress(plan, phase, sources) \
+            if sources is not None else []
+    wanted = [name for name in phase['stress'] if name not in skip]
+    for name in list(running):
+        if name not in wanted:
+            stop_stress(running, name)
+    for name in skip:
+        say('Skipping {} stress: no {} source'.format(name,
+                plan['requires'][name]))
+    for name in wanted:
+        if name not in running:
+            cmd = stress_command(plan, name, topology)
+            say(' '.join(cmd))
+            try:
+                running[name] = Popen(cmd, stdout=out, stderr=out)
+            except OSError as e:
+                say('Could not start {} stress: {}'.format(name, e))
+
+
+def stop_stress(running, name=None):
+    for name in [name] if name else list(running):
+        p = running.pop(name)
+        p.terminate()
+        p.wait()
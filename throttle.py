@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+
+import sys
+
+#per-product overrides go in the plan's "throttle" object
+THROTTLE_FLOOR = None  #MHz; None means FLOOR_FRACTION of the core's best clock
+FLOOR_FRACTION = 0.9
+THROTTLE_TJMAX = 100
+THROTTLE_MARGIN = 5  #degrees below Tjmax that already count as hot
+THROTTLE_UTIL = 95  #percent busy that counts as fully loaded
+MAX_INTERVALS = 50  #intervals listed in the summary, the counts cover all
+
+
+def new_throttle(floor=THROTTLE_FLOOR, tjmax=THROTTLE_TJMAX,
+        margin=THROTTLE_MARGIN, util=THROTTLE_UTIL, fraction=FLOOR_FRACTION):
+    return dict(floor=floor, hot=tjmax - margin, util=util, fraction=fraction,
+            peak={}, t0=None, last=None, active=False, count=0, seconds=0.0,
+            loss_sum=0.0, loss_n=0, max_loss=0.0, intervals=[])
+
+
+def update_throttle(detector, t, sample):
+    #one aligned tick: cores under the floor while busy and near Tjmax
+    if detector['t0'] is None:
+        detector['t0'] = t
+    dt = t - detector['last'] if detector['last'] is not None else 0.0
+    detector['last'] = t
+    temps = [v for v in sample.get('CPU_Temp', {}).values() if v == v]
+    hot = bool(temps) and max(temps) >= detector['hot']
+    utils = sample.get('CPU_Utilization', {})
+    losses = []
+    for (label, mhz) in sample.get('CPU_Clockspeed', {}).items():
+        peak = max(detector['peak'].get(label, 0), mhz)
+        detector['peak'][label] = peak
+        floor = detector['floor'] or detector['fraction'] * peak
+        #CPU_Clockspeed is 'Core <id>', CPU_Utilization 'Core: <id>'
+        busy = utils.get('Core: ' + label.split()[-1], 0)
+        if hot and busy >= detector['util'] and mhz < floor:
+            losses.append(peak - mhz)  #against the best clock this core did
+    if not losses:
+        detector['active'] = False
+        return False
+    if not detector['active']:
+        detector['active'] = True
+        detector['count'] += 1
+        if len(detector['intervals']) < MAX_INTERVALS:
+            detector['intervals'].append([t - detector['t0'], 0.0])
+    detector['seconds'] += dt
+    if detector['count'] <= MAX_INTERVALS:
+        detector['intervals'][-1][1] += dt
+    detector['loss_sum'] += sum(losses)
+    detector['loss_n'] += len(losses)
+    detector['max_loss'] = max([detector['max_loss']] + losses)
+    return True
+
+
+def summarize_throttle(detector):
+    mean_loss = detector['loss_sum'] / detector['loss_n'] \
+            if detector['loss_n'] else 0.0
+    return {'Throttling': {'throttle_count': detector['count'],
+            'throttled_seconds': detector['seconds'],
+            'mean_mhz_loss': mean_loss,
+            'max_mhz_loss': detector['max_loss'],
+            'intervals': detector['intervals']}}
+
+
+def find_throttle(store, **kwargs):
+    #offline over a recorded columns store
+    detector = new_throttle(**kwargs)
+    for i in range(len(store['time'])):
+        sample = {}
+        for ((channel, k), column) in store['columns'].items():
+            sample.setdefault(channel, {})[k] = column[i]
+        update_throttle(detector, store['time'][i], sample)
+    return summarize_throttle(detector)
+
+
+if __name__ == '__main__':
+    #./throttle.py testresults/temps-*-columns.bin
+    import json
+    from columns import load_columns
+    for filename in sys.argv[1:]:
+        print(json.dumps({filename: find_throttle(load_columns(filename))}))
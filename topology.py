@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+
+import os
+import re
+import sys
+import json
+from glob import glob
+from os import path, makedirs
+from subprocess import check_output, CalledProcessError, DEVNULL
+
+from hwmon import iter_hwmon_inputs
+
+CACHEDIR = path.expanduser('~/.cache/thermal-testing/')
+#where /sys, /proc and /etc are looked up, e.g. a ./simulator.py tree
+ROOT = os.environ.get('THERMAL_ROOT', '/')
+DMIDECODE = ['sudo', '-n', 'dmidecode', '-t', 'memory']
+
+
+def read_first(filename, default=''):
+    try:
+        with open(filename) as fp:
+            return fp.read().strip()
+    except OSError:
+        return default
+
+
+def machine_key(root='/'):
+    #machine-id tells OS installs apart, the DMI serial tells boards apart;
+    #product_serial is root-only, so fall back to the board's
+    machine_id = read_first(path.join(root, 'etc/machine-id'), 'unknown')
+    serial = read_first(path.join(root, 'sys/class/dmi/id/product_serial')) \
+            or read_first(path.join(root, 'sys/class/dmi/id/board_serial')) \
+            or 'unknown'
+    return '{}-{}'.format(machine_id, re.sub(r'[^\w.-]', '_', serial))
+
+
+def probe_cpus(root='/'):
+    cpus = glob(path.join(root, 'sys/devices/system/cpu/cpu[0-9]*/topology'))
+    packages = set()
+    cores = set()
+    for topo in cpus:
+        package = read_first(path.join(topo, 'physical_package_id'), '0')
+        packages.add(package)
+        cores.add((package, read_first(path.join(topo, 'core_id'), topo)))
+    return dict(cpus=len(cpus), sockets=len(packages), cores=len(cores))
+
+
+def probe_numa(root='/'):
+    return len(glob(path.join(root, 'sys/devices/system/node/node[0-9]*')))
+
+
+def parse_dmidecode(text):
+    #every 'Memory Device' has a Size: line, empty slots say No Module Installed
+    slots = 0
+    dimms = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('Size:'):
+            slots += 1
+            if 'No Module Installed' not in line:
+                dimms += 1
+    return dict(dimm_slots=slots, dimms=dimms)
+
+
+def probe_dimms(dmidecode=DMIDECODE):
+    try:
+        text = check_output(dmidecode, stderr=DEVNULL).decode()
+    except (OSError, CalledProcessError):  #no dmidecode or no sudo rights
+        return dict(dimm_slots=None, dimms=None)
+    return parse_dmidecode(text)
+
+
+def probe_gpus(root='/'):
+    #the driver lists one directory per GPU, no nvidia-smi fork needed
+    return len(glob(path.join(root, 'proc/driver/nvidia/gpus/*')))
+
+
+def probe_hwmon(root='/'):
+    #hwmonN numbering can change between boots, so this part of the cache is
+    #only trusted for the boot it was discovered in
+    hwmon_root = path.join(root, 'sys/class/hwmon')
+    return dict(boot_id=read_first(path.join(root,
+            'proc/sys/kernel/random/boot_id')),
+            hwmon=[list(item) for item in iter_hwmon_inputs(hwmon_root)],
+            hwmon_fans=[list(item)
+                    for item in iter_hwmon_inputs(hwmon_root, 'fan')])
+
+
+def probe_topology(root='/', dmidecode=DMIDECODE):
+    topology = dict(key=machine_key(root))
+    topology.update(probe_cpus(root))
+    topology['numa_nodes'] = probe_numa(root)
+    topology.update(probe_dimms(dmidecode))
+    topology['gpus'] = probe_gpus(root)
+    topology.update(probe_hwmon(root))
+    return topology
+
+
+def cache_name(key, cachedir=CACHEDIR):
+    return path.join(cachedir, 'topology-{}.json'.format(key))
+
+
+def load_topology(root=ROOT, dmidecode=DMIDECODE, cachedir=CACHEDIR,
+        refresh=False):
+    filename = cache_name(machine_key(root), cachedir)
+    topology = None
+    if not refresh:
+        try:
+            with open(filename) as fp:
+                topology = json.load(fp)
+        except (OSError, ValueError):
+            topology = None
+    if topology is None:
+        topology = probe_topology(root, dmidecode)
+    else:
+        fresh = True
+        if 'hwmon_fans' not in topology or \
+                topology.get('boot_id') != read_first(path.join(root,
+                'proc/sys/kernel/random/boot_id')):
+            topology.update(probe_hwmon(root))
+            fresh = False
+        if topology.get('dimms') is None:  #dmidecode failed last time
+            topology.update(probe_dimms(dmidecode))
+            fresh = topology['dimms'] is None
+        if fresh:
+            return topology
+    if not path.exists(cachedir):
+        makedirs(cachedir)
+    #a failed dmidecode (no sudo rights yet) is left out so the next run
+    #tries again instead of sizing stress from NUMA nodes forever
+    cached = dict((k, v) for (k, v) in topology.items()
+            if v is not None or k not in ('dimm_slots', 'dimms'))
+    with open(filename + '.tmp', 'w') as fp:
+        json.dump(cached, fp, indent=4, sort_keys=True)
+    os.replace(filename + '.tmp', filename)
+    return topology
+
+
+def stress_vm_workers(topology):
+    #one --vm worker per populated DIMM so every stick sees memory traffic
+    #and heats up, else one per NUMA node, else the 2 stress-ng always ran
+    return topology.get('dimms') or topology.get('numa_nodes') or 2
+
+
+if __name__ == '__main__':
+    #./topology.py [--refresh] prints what this machine was probed as
+    print(json.dumps(load_topology(refresh='--refresh' in sys.argv[1:]),
+            indent=4, sort_keys=True))